@@ -0,0 +1,156 @@
+# backend/actions.py
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from .commands import STOP_COMMANDS
+from .metrics import Histogram
+
+# Buckets en ms para acciones (incluyen la espera de respuesta del robot)
+ACTION_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+@dataclass
+class _Action:
+    name: str
+    source: str
+    t_submit: float = field(default_factory=perf_counter)
+
+
+class ActionWorker:
+    """
+    Ejecuta las acciones de botones/cruceta fuera del bucle de teleop.
+
+    - Cola acotada (Settings.action_queue_size); si está llena, la acción más antigua
+      en cola queda sustituida por la nueva.
+    - Deduplicación: pulsar otra vez una acción que ya está en cola o ejecutándose no
+      la repite.
+    - StopMove/Damp cancelan la acción en curso y vacían la cola (todo queda superado)
+      y se ejecutan los primeros.
+    - Latencia por acción: espera en cola y total hasta completarse, en histogramas.
+    """
+
+    def __init__(self, client, settings):
+        self.client = client
+        self.settings = settings
+
+        self._queue: deque[_Action] = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._current: Optional[_Action] = None
+        self._current_task: Optional[asyncio.Task] = None
+        self._preempted = False
+
+        # Contadores
+        self.submitted = 0
+        self.completed = 0
+        self.deduplicated = 0
+        self.superseded = 0
+        self.cancelled = 0
+        self.failed = 0
+        self._wait_ms: Dict[str, Histogram] = {}
+        self._total_ms: Dict[str, Histogram] = {}
+
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.superseded += len(self._queue)
+        self._queue.clear()
+
+    def submit(self, name: str, source: str = "") -> bool:
+        """Encola la acción sin bloquear. False si se descarta por duplicada."""
+        if not self._task:
+            return False
+        if (self._current and self._current.name == name) or any(a.name == name for a in self._queue):
+            self.deduplicated += 1
+            return False
+
+        action = _Action(name, source)
+        self.submitted += 1
+        if name in STOP_COMMANDS:
+            self.superseded += len(self._queue)
+            self._queue.clear()
+            if self._current_task and not self._current_task.done():
+                self._preempted = True
+                self._current_task.cancel()
+            self._queue.appendleft(action)
+        else:
+            if len(self._queue) >= max(1, int(self.settings.action_queue_size)):
+                dropped = self._queue.popleft()
+                self.superseded += 1
+                logger.debug(f"Acción {dropped.name} superada por {name}")
+            self._queue.append(action)
+        self._wake.set()
+        return True
+
+    async def _worker(self):
+        while True:
+            if not self._queue:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            action = self._queue.popleft()
+            self._current = action
+            t_start = perf_counter()
+            self._current_task = asyncio.create_task(self.client.cmd(action.name))
+            try:
+                await self._current_task
+                self.completed += 1
+                self._observe(action, t_start)
+            except asyncio.CancelledError:
+                # Sólo se absorbe la cancelación hecha por un StopMove; la del worker se propaga
+                if not self._preempted:
+                    raise
+                self._preempted = False
+                self.cancelled += 1
+                logger.info(f"Acción {action.name} cancelada por parada")
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Acción {action.name} ({action.source}) falló: {e}")
+            finally:
+                self._current = None
+                self._current_task = None
+
+    def _observe(self, action: _Action, t_start: float):
+        t_end = perf_counter()
+        wait = self._wait_ms.setdefault(action.name, Histogram(ACTION_BUCKETS))
+        total = self._total_ms.setdefault(action.name, Histogram(ACTION_BUCKETS))
+        wait.observe((t_start - action.t_submit) * 1000.0)
+        total.observe((t_end - action.t_submit) * 1000.0)
+        if self.settings.log_gamepad:
+            logger.debug(f"Acción {action.name} completada en {(t_end - action.t_submit) * 1000.0:.1f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": [a.name for a in self._queue],
+            "in_flight": self._current.name if self._current else None,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "deduplicated": self.deduplicated,
+            "superseded": self.superseded,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "latency_ms": {
+                name: {"wait": self._wait_ms[name].snapshot(), "total": self._total_ms[name].snapshot()}
+                for name in self._total_ms
+            },
+        }
@@ -0,0 +1,325 @@
+# backend/commands.py
+import asyncio
+import heapq
+import json
+import math
+from itertools import count
+from time import monotonic, perf_counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from .metrics import Histogram, MS_BUCKETS
+
+# Prioridades del canal de comandos (menor = antes)
+PRIO_STOP = 0    # StopMove / Damp
+PRIO_CMD = 1     # SPORT_CMD discretos (StandUp, Hello, ...)
+PRIO_MOVE = 2    # Move continuo (hueco único, gana el último)
+
+STOP_COMMANDS = frozenset({"StopMove", "Damp"})
+
+
+class MoveFilter:
+    """
+    Supresión de Move repetidos con heartbeat.
+
+    Un Move se envía si alguna componente cambia más de 'epsilon' respecto al último
+    enviado, o si han pasado 'heartbeat_s' desde el último envío (keepalive para que el
+    timeout de comandos del robot no salte). Con los sticks quietos en (0,0,0) esto
+    reduce el tráfico del datachannel a un mensaje por heartbeat.
+    """
+
+    def __init__(self, epsilon: float = 0.01, heartbeat_s: float = 0.25):
+        self.epsilon = float(epsilon)
+        self.heartbeat_s = float(heartbeat_s)
+        self._last: Optional[tuple[float, float, float]] = None
+        self._last_t = 0.0
+
+        # Contadores
+        self.sent = 0
+        self.suppressed = 0
+
+    def reset(self):
+        """Olvida el último Move: el siguiente se envía siempre (tras StopMove, reconexión...)."""
+        self._last = None
+
+    def should_send(self, x: float, y: float, z: float, now: Optional[float] = None) -> bool:
+        now = monotonic() if now is None else now
+        last = self._last
+        if (
+            last is not None
+            and now - self._last_t < self.heartbeat_s
+            and abs(x - last[0]) <= self.epsilon
+            and abs(y - last[1]) <= self.epsilon
+            and abs(z - last[2]) <= self.epsilon
+        ):
+            self.suppressed += 1
+            return False
+        self._last = (x, y, z)
+        self._last_t = now
+        self.sent += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "epsilon": self.epsilon,
+            "heartbeat_s": self.heartbeat_s,
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+        }
+
+
+class MovePayload:
+    """
+    Fast path del Move: api_id cacheado y 'parameter' ya serializado.
+
+    El driver acepta 'parameter' ya serializado (str) y entonces no llama a json.dumps
+    sobre él; aquí se rellena con un formato fijo equivalente a json.dumps de los tres
+    floats. Cada Move lleva su propio dict (dos claves): el scheduler publica en una task
+    aparte y cede el loop antes del envío, así que un dict compartido podría reescribirse
+    con el Move de otro llamante (HTTP y teleop) antes de salir.
+    """
+
+    __slots__ = ("api_id",)
+
+    _FMT = '{"x": %r, "y": %r, "z": %r}'
+
+    def __init__(self, api_id: int):
+        self.api_id = api_id
+
+    def fill(self, x: float, y: float, z: float) -> Dict[str, Any]:
+        x, y, z = float(x), float(y), float(z)
+        if math.isfinite(x) and math.isfinite(y) and math.isfinite(z):
+            parameter = self._FMT % (x, y, z)
+        else:
+            parameter = json.dumps({"x": x, "y": y, "z": z})
+        return {"api_id": self.api_id, "parameter": parameter}
+
+
+class CommandScheduler:
+    """
+    Único escritor del datachannel para todos los comandos salientes.
+
+    - StopMove/Damp no esperan hueco en la cola: pasan al frente, descartan los SPORT_CMD
+      encolados (sus llamantes reciben None) y vacían el Move pendiente.
+    - Los SPORT_CMD discretos van en una cola de prioridad acotada (FIFO dentro de cada
+      prioridad); si se llena, quien envía espera (backpressure para ráfagas HTTP).
+    - Move tiene un único hueco: si llega uno nuevo antes de enviarse el anterior, lo
+      sustituye (coalescing) y ambos llamantes se resuelven con el mismo envío.
+
+    El writer no espera la respuesta del robot antes de enviar el siguiente mensaje:
+    publish_request_new llega a channel.send() sin ceder el loop y luego espera la
+    respuesta, así que se lanza como task propia, se cede el loop una vez (el envío ya ha
+    ocurrido, en orden) y el timeout de la respuesta se vigila aparte con call_later.
+    Cada future de submit*() se resuelve con el instante perf_counter() tomado en esa
+    task justo antes de publicar, es decir, cuando el mensaje sale por el canal.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+        queue_size: int = 32,
+        response_timeout: float = 5.0,
+    ):
+        self.publish = publish
+        self.queue_size = max(1, int(queue_size))
+        self.response_timeout = float(response_timeout)
+
+        self._heap: list = []
+        self._ids = count()
+        self._move: Optional[tuple[str, Dict[str, Any], list[asyncio.Future], float]] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+        self._sending: list[asyncio.Future] = []   # futures del mensaje que el writer está enviando
+        self._timers: Dict[asyncio.Task, asyncio.TimerHandle] = {}
+        self._expired: set[asyncio.Task] = set()
+
+        # Contadores
+        self.sent = {PRIO_STOP: 0, PRIO_CMD: 0, PRIO_MOVE: 0}
+        self.coalesced = 0
+        self.move_dropped_by_stop = 0
+        self.cmd_dropped_by_stop = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.queue_wait_ms = Histogram(MS_BUCKETS)
+
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task:
+            return
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """Para el writer; todo lo pendiente (en envío, en cola, el Move) se resuelve con None."""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Como con un STOP: quien esperaba recibe None (no enviado), nunca CancelledError
+        pending = self._sending + [item[4] for item in self._heap]
+        if self._move is not None:
+            pending += self._move[2]
+        for fut in pending:
+            if not fut.done():
+                fut.set_result(None)
+        self._sending = []
+        self._heap.clear()
+        self._move = None
+        self._space.set()   # los que esperaban hueco ven el scheduler parado
+        for t in list(self._inflight):
+            t.cancel()
+        self._inflight.clear()
+
+    # ---------- Envío ----------
+
+    async def submit(self, topic: str, payload: Dict[str, Any], priority: int = PRIO_CMD) -> Optional[float]:
+        """Encola un comando discreto y espera a que salga por el canal (None si no sale)."""
+        if priority == PRIO_STOP:
+            self._drop_queued()
+            self._drop_move()
+        else:
+            while self._task is not None and len(self._heap) >= self.queue_size:
+                self._space.clear()
+                await self._space.wait()
+        if self._task is None:
+            return None
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._ids), topic, payload, fut, perf_counter()))
+        self._wake.set()
+        return await fut
+
+    def submit_move(self, topic: str, payload: Dict[str, Any]) -> asyncio.Future:
+        """Deja el Move en el hueco (sustituye al pendiente). El future se resuelve al enviarse."""
+        fut = asyncio.get_running_loop().create_future()
+        if self._task is None:
+            fut.set_result(None)
+            return fut
+        if self._move is not None:
+            self.coalesced += 1
+            futs = self._move[2]
+            futs.append(fut)
+            self._move = (topic, payload, futs, self._move[3])
+        else:
+            self._move = (topic, payload, [fut], perf_counter())
+        self._wake.set()
+        return fut
+
+    def _drop_queued(self):
+        """Un STOP anula lo que esperaba en cola (salvo otros STOP)."""
+        keep = []
+        for item in self._heap:
+            if item[0] == PRIO_STOP:
+                keep.append(item)
+                continue
+            fut = item[4]
+            if not fut.done():
+                fut.set_result(None)
+            self.cmd_dropped_by_stop += 1
+        if len(keep) != len(self._heap):
+            heapq.heapify(keep)
+            self._heap[:] = keep
+            self._space.set()
+
+    def _drop_move(self):
+        if self._move is None:
+            return
+        for fut in self._move[2]:
+            if not fut.done():
+                fut.set_result(None)
+        self._move = None
+        self.move_dropped_by_stop += 1
+
+    async def _writer(self):
+        while True:
+            if self._heap:
+                priority, _, topic, payload, fut, t_submit = heapq.heappop(self._heap)
+                self._space.set()
+                futs = [fut]
+            elif self._move is not None:
+                topic, payload, futs, t_submit = self._move
+                self._move = None
+                priority = PRIO_MOVE
+            else:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            futs = [f for f in futs if not f.done()]
+            if not futs:
+                continue   # quien lo pidió ya no espera (p.ej. acción cancelada)
+            self._sending = futs
+            t_sent = await self._send(topic, payload)
+            self._sending = []
+            self.queue_wait_ms.observe((perf_counter() - t_submit) * 1000.0)
+            if t_sent is not None:
+                self.sent[priority] += 1
+            for f in futs:
+                if not f.done():
+                    f.set_result(t_sent)
+
+    async def _publish_stamped(self, topic: str, payload: Dict[str, Any], stamp: list):
+        # Sin awaits entre esta marca y channel.send(): es el instante real de envío
+        stamp.append(perf_counter())
+        return await self.publish(topic, payload)
+
+    async def _send(self, topic: str, payload: Dict[str, Any]) -> Optional[float]:
+        stamp: list = []
+        task = asyncio.ensure_future(self._publish_stamped(topic, payload, stamp))
+        # Una vuelta del loop: la task llega hasta channel.send() y se queda esperando respuesta
+        while not stamp and not task.done():
+            await asyncio.sleep(0)
+        t_sent = stamp[0] if stamp else None
+        if task.done():
+            self._on_response(task)
+            return None if task.cancelled() or task.exception() else t_sent
+        self._inflight.add(task)
+        self._timers[task] = asyncio.get_running_loop().call_later(self.response_timeout, self._expire, task)
+        task.add_done_callback(self._on_response)
+        return t_sent
+
+    def _expire(self, task: asyncio.Task):
+        self._expired.add(task)
+        task.cancel()
+
+    def _on_response(self, task: asyncio.Task):
+        self._inflight.discard(task)
+        timer = self._timers.pop(task, None)
+        if timer is not None:
+            timer.cancel()
+        if task.cancelled():
+            if task in self._expired:
+                self._expired.discard(task)
+                self.timeouts += 1
+            return
+        exc = task.exception()
+        if exc is None:
+            return
+        self.errors += 1
+        logger.warning(f"Error publicando comando: {exc}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._heap),
+            "move_pending": self._move is not None,
+            "inflight": len(self._inflight),
+            "sent_stop": self.sent[PRIO_STOP],
+            "sent_cmd": self.sent[PRIO_CMD],
+            "sent_move": self.sent[PRIO_MOVE],
+            "move_coalesced": self.coalesced,
+            "move_dropped_by_stop": self.move_dropped_by_stop,
+            "cmd_dropped_by_stop": self.cmd_dropped_by_stop,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
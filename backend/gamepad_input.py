@@ -0,0 +1,269 @@
+# backend/gamepad_input.py
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import pygame
+from loguru import logger
+
+from .settings import Settings
+
+
+@dataclass(frozen=True)
+class GamepadSnapshot:
+    """Estado inmutable del mando en un instante (t_read = perf_counter() de la lectura SDL)."""
+    t_read: float
+    connected: bool
+    axes: tuple[float, ...] = ()
+    buttons: tuple[bool, ...] = ()
+    hats: tuple[tuple[int, int], ...] = ()
+
+    def axis(self, i: int) -> float:
+        return self.axes[i] if 0 <= i < len(self.axes) else 0.0
+
+    def button(self, i: int) -> bool:
+        return self.buttons[i] if 0 <= i < len(self.buttons) else False
+
+
+@dataclass(frozen=True)
+class GamepadEvent:
+    """Flanco de botón o movimiento de cruceta."""
+    kind: str              # "button_down" | "button_up" | "hat"
+    index: int             # botón o nº de hat
+    value: Any = None      # (x, y) para "hat"
+    t_read: float = 0.0
+
+
+EMPTY_SNAPSHOT = GamepadSnapshot(t_read=0.0, connected=False)
+
+# Un lector por índice de mando. La cola de eventos de SDL es global: el lector que la
+# vacía reparte cada flanco al lector del mando que lo generó, y el pump se serializa.
+_readers: dict[int, "GamepadReader"] = {}
+_sdl_lock = threading.Lock()
+
+
+class GamepadReader:
+    """
+    Lectura del mando fuera del event loop.
+
+    Con Settings.gamepad_thread un hilo propio hace pygame.event.pump()/get() y lee ejes
+    y botones a gamepad_poll_hz. Lo entrega al loop de dos formas:
+      - 'latest': último GamepadSnapshot inmutable. Se publica con una simple asignación
+        de referencia (atómica con el GIL), sin locks: el lector siempre ve uno completo.
+      - 'events': asyncio.Queue acotada con los flancos de botones/cruceta, alimentada
+        con loop.call_soon_threadsafe.
+    Sin hilo (macOS: SDL exige el hilo principal) el teleop llama a poll_once() en el loop.
+    Con varios mandos hay un lector por índice (TeleopManager.reader()).
+
+    Doble backend, como antes en XboxTeleop:
+      - SDL2 GameController (pygame._sdl2.controller.Controller) si está disponible
+      - Joystick clásico (pygame.joystick.Joystick) como fallback
+    """
+
+    def __init__(self, settings: Settings, index: int = 0):
+        self.settings = settings
+        self.index = index
+
+        self.latest: GamepadSnapshot = EMPTY_SNAPSHOT
+        self.events: Optional[asyncio.Queue] = None
+        self.events_dropped = 0
+        self.polls = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        _readers[index] = self
+
+        # ---- Inicializa pygame ----
+        pygame.init()
+        pygame.joystick.init()
+
+        # ---- Backend 1: SDL2 GameController ----
+        self.gc = None
+        try:
+            from pygame._sdl2 import controller as sdl2c  # type: ignore
+            if sdl2c.get_count() > index:
+                self.gc = sdl2c.Controller(index)
+                logger.success(f"🎮 [SDL2] Controlador: {self.gc.name}")
+        except Exception as e:
+            if self.settings.log_gamepad:
+                logger.debug(f"[SDL2] Controller no disponible: {e}")
+
+        # ---- Backend 2: Joystick clásico ----
+        self.js = None
+        if pygame.joystick.get_count() > index:
+            self.js = pygame.joystick.Joystick(index)
+            self.js.init()
+            try:
+                name = self.js.get_name()
+            except Exception:
+                name = "Unknown Controller"
+            logger.success(f"🎮 [JOY ] Joystick: {name}")
+            logger.info(f"[JOY ] Axes={self.js.get_numaxes()} Buttons={self.js.get_numbuttons()} Hats={self.js.get_numhats()}")
+        elif not self.gc:
+            logger.warning("⚠️ No se ha detectado ningún mando en SDL2 ni Joystick.")
+
+    # ---------- Ciclo de vida ----------
+
+    def connected(self) -> bool:
+        return bool(self.gc) or bool(self.js)
+
+    def threaded(self) -> bool:
+        return self._thread is not None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is not None:
+            return
+        self._loop = loop
+        self.events = asyncio.Queue(maxsize=self.settings.gamepad_event_queue)
+        if self.settings.gamepad_thread:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"gamepad-{self.index}", daemon=True)
+            self._thread.start()
+            logger.info(f"🎮 Lector de mando en hilo propio a {self.settings.gamepad_poll_hz:g} Hz")
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._loop = None
+
+    def _run(self):
+        period = 1.0 / max(1.0, float(self.settings.gamepad_poll_hz))
+        next_t = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"Lector de mando: {e}")
+            next_t += period
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = time.perf_counter()   # no intenta recuperar lecturas perdidas
+
+    # ---------- Lectura SDL ----------
+
+    def poll_once(self) -> GamepadSnapshot:
+        """Pump de eventos + lectura de ejes/botones. En el hilo lector, o en el loop sin hilo."""
+        with _sdl_lock:
+            # Pump de eventos siempre (importante en macOS)
+            pygame.event.pump()
+            t_read = time.perf_counter()
+            for event in pygame.event.get():
+                if event.type == pygame.JOYBUTTONDOWN:
+                    ev = GamepadEvent("button_down", event.button, t_read=t_read)
+                elif event.type == pygame.JOYBUTTONUP:
+                    ev = GamepadEvent("button_up", event.button, t_read=t_read)
+                elif event.type == pygame.JOYHATMOTION:
+                    ev = GamepadEvent("hat", event.hat, tuple(event.value), t_read=t_read)
+                else:
+                    continue
+                _readers.get(getattr(event, "joy", self.index), self)._emit(ev)
+
+            snap = GamepadSnapshot(
+                t_read=t_read,
+                connected=self.connected(),
+                axes=tuple(self._axis_raw(i) for i in range(self._num_axes())),
+                buttons=tuple(self._button_state(i) for i in range(self._num_buttons())),
+                hats=self._hats(),
+            )
+        self.latest = snap
+        self.polls += 1
+        return snap
+
+    def _emit(self, ev: GamepadEvent):
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            in_loop = False
+        # Desde un hilo lector (el propio o el de otro mando) hay que pasar por el loop
+        if in_loop:
+            self._push_event(ev)
+        else:
+            loop.call_soon_threadsafe(self._push_event, ev)
+
+    def _push_event(self, ev: GamepadEvent):
+        q = self.events
+        if q is None:
+            return
+        if q.full():
+            q.get_nowait()
+            self.events_dropped += 1
+        q.put_nowait(ev)
+
+    def _num_axes(self) -> int:
+        if self.gc:
+            return 6  # mapeo típico
+        if self.js:
+            return self.js.get_numaxes()
+        return 0
+
+    def _num_buttons(self) -> int:
+        if self.gc:
+            return 16  # mapeo típico Xbox
+        if self.js:
+            return self.js.get_numbuttons()
+        return 0
+
+    def _axis_raw(self, i: int) -> float:
+        """
+        SDL2 GameController mapea por nombre:
+          0: leftx, 1: lefty, 2: rightx, 3:righty, 4:lefttrigger, 5:righttrigger
+        """
+        if self.gc:
+            try:
+                return float(self.gc.get_axis(i))
+            except Exception:
+                return 0.0
+        if self.js and 0 <= i < self.js.get_numaxes():
+            return float(self.js.get_axis(i))
+        return 0.0
+
+    def _button_state(self, i: int) -> bool:
+        if self.gc:
+            try:
+                return bool(self.gc.get_button(i))
+            except Exception:
+                return False
+        if self.js and 0 <= i < self.js.get_numbuttons():
+            return bool(self.js.get_button(i))
+        return False
+
+    def _hats(self) -> tuple[tuple[int, int], ...]:
+        if self.js:
+            return tuple(tuple(self.js.get_hat(i)) for i in range(self.js.get_numhats()))
+        return ()
+
+    # ---------- Acceso desde el loop ----------
+
+    def snapshot(self) -> GamepadSnapshot:
+        """Último estado. Sin hilo lector se refresca en el acto si está caducado."""
+        if self._thread is None:
+            max_age = 1.0 / max(1.0, float(self.settings.gamepad_poll_hz))
+            if time.perf_counter() - self.latest.t_read > max_age:
+                return self.poll_once()
+        return self.latest
+
+    def drain_events(self) -> list[GamepadEvent]:
+        q = self.events
+        out = []
+        while q is not None and not q.empty():
+            out.append(q.get_nowait())
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "threaded": self.threaded(),
+            "poll_hz": self.settings.gamepad_poll_hz,
+            "polls": self.polls,
+            "events_dropped": self.events_dropped,
+            "snapshot_age_ms": (time.perf_counter() - self.latest.t_read) * 1000.0 if self.latest.t_read else None,
+        }
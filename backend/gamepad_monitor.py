@@ -1,13 +1,146 @@
-
 import asyncio
+import json
+from collections import deque
+from typing import Any, Dict, Optional
+
 from loguru import logger
 
+from .gamepad_input import GamepadSnapshot
+from .ticker import FixedRateTicker
+
+# Cola por cliente: si se llena, se vacía y se reenvía un keyframe (un delta perdido
+# dejaría al cliente desincronizado)
+SUBSCRIBER_QUEUE = 8
+
+
+def _json(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+class GamepadSubscriber:
+    """Cliente de /ws/gamepad: frames JSON pendientes de enviar."""
+
+    def __init__(self, stream: "_GamepadStream"):
+        self.stream = stream
+        self.pending: deque[str] = deque()
+        self.wake = asyncio.Event()
+        self.resyncs = 0
+
+    def offer(self, frame: str):
+        if len(self.pending) >= SUBSCRIBER_QUEUE:
+            self.pending.clear()
+            self.resyncs += 1
+            frame = self.stream.keyframe()
+        self.pending.append(frame)
+        self.wake.set()
+
+    async def get(self) -> str:
+        while not self.pending:
+            self.wake.clear()
+            await self.wake.wait()
+        return self.pending.popleft()
+
+
+class _GamepadStream:
+    """
+    Estado enviado de un mando y sus suscriptores.
+
+    'Enviado' es lo que tienen todos los clientes: un eje sólo se actualiza cuando se
+    aleja más de epsilon del último valor enviado (no del tick anterior), así el error
+    nunca se acumula. El keyframe de un cliente nuevo es ese mismo estado, de modo que
+    los deltas compartidos le sirven tal cual.
+    """
+
+    def __init__(self, index: int, reader):
+        self.index = index
+        self.reader = reader
+        self.subscribers: set[GamepadSubscriber] = set()
+        self.seq = 0
+        self.t = 0.0
+        self.connected = False
+        self.axes: list[float] = []
+        self.buttons: list[bool] = []
+        self.hats: list[tuple[int, int]] = []
+
+    def keyframe(self) -> str:
+        return _json({
+            "k": 1,
+            "s": self.seq,
+            "t": self.t,
+            "c": int(self.connected),
+            "a": [round(v, 3) for v in self.axes],
+            "b": [int(v) for v in self.buttons],
+            "h": [list(h) for h in self.hats],
+        })
+
+    def update(self, snap: GamepadSnapshot, epsilon: float) -> Optional[str]:
+        """Aplica el snapshot y devuelve el frame a difundir (None si nada supera epsilon)."""
+        self.t = snap.t_read
+        layout = (len(snap.axes), len(snap.buttons), len(snap.hats))
+        if layout != (len(self.axes), len(self.buttons), len(self.hats)) or snap.connected != self.connected:
+            # Mando conectado/desconectado o cambio de mapeo: estado completo
+            self.seq += 1
+            self.connected = snap.connected
+            self.axes = list(snap.axes)
+            self.buttons = list(snap.buttons)
+            self.hats = list(snap.hats)
+            return self.keyframe()
+
+        delta: Dict[str, Any] = {}
+        axes = {}
+        for i, v in enumerate(snap.axes):
+            if abs(v - self.axes[i]) > epsilon:
+                self.axes[i] = v
+                axes[str(i)] = round(v, 3)
+        buttons = {}
+        for i, v in enumerate(snap.buttons):
+            if v != self.buttons[i]:
+                self.buttons[i] = v
+                buttons[str(i)] = int(v)
+        hats = {}
+        for i, v in enumerate(snap.hats):
+            if v != self.hats[i]:
+                self.hats[i] = v
+                hats[str(i)] = list(v)
+        if not (axes or buttons or hats):
+            return None
+        self.seq += 1
+        delta["s"] = self.seq
+        delta["t"] = self.t
+        if axes:
+            delta["a"] = axes
+        if buttons:
+            delta["b"] = buttons
+        if hats:
+            delta["h"] = hats
+        return _json(delta)
+
+
 class GamepadMonitor:
-    """Placeholder for future WS broadcast of gamepad state."""
+    """
+    Difunde el estado de los mandos por /ws/gamepad a Settings.gamepad_monitor_hz.
+
+    Lee los snapshots de los GamepadReader que ya existen (sin tocar SDL ni crear
+    lectores: un índice sin lector se rechaza) y manda sólo lo que cambia:
+      keyframe {"k":1,"s","t","c","a":[...],"b":[...],"h":[[x,y]...]} al conectar,
+      delta    {"s","t","a":{eje:valor},"b":{botón:0|1},"h":{hat:[x,y]}} después,
+    con los ejes redondeados a 3 decimales y sólo si se mueven más de
+    gamepad_monitor_epsilon. Cada frame se serializa una vez para todos los clientes.
+    Sin clientes el bucle duerme.
+    """
+
     def __init__(self, manager):
         self.manager = manager
         self._task = None
         self._running = False
+        self._streams: Dict[int, _GamepadStream] = {}
+        self._has_clients = asyncio.Event()
+        self.ticker = FixedRateTicker(self.manager.settings.gamepad_monitor_hz)
+
+        # Contadores
+        self.frames = 0
+        self.keyframes = 0
+        self.bytes = 0
 
     async def start(self):
         if self._running: return
@@ -19,13 +152,74 @@ class GamepadMonitor:
         self._running = False
         if self._task:
             self._task.cancel()
-            try: 
+            try:
                 await self._task
             except asyncio.CancelledError:
                 pass
             self._task = None
 
+    # ---------- Suscripciones ----------
+
+    def subscribe(self, index: int) -> Optional[GamepadSubscriber]:
+        """None si no hay lector para ese mando (no se crea uno por petición de un cliente)."""
+        stream = self._streams.get(index)
+        if stream is None:
+            reader = self.manager.existing_reader(index)
+            if reader is None:
+                return None
+            stream = self._streams[index] = _GamepadStream(index, reader)
+            self._tick_stream(stream)   # estado inicial antes del primer keyframe
+        sub = GamepadSubscriber(stream)
+        sub.offer(stream.keyframe())
+        self.keyframes += 1
+        stream.subscribers.add(sub)
+        self._has_clients.set()
+        return sub
+
+    def unsubscribe(self, sub: GamepadSubscriber):
+        stream = sub.stream
+        stream.subscribers.discard(sub)
+        if not stream.subscribers:
+            self._streams.pop(stream.index, None)
+        if not self._streams:
+            self._has_clients.clear()
+
+    # ---------- Bucle ----------
+
+    def _tick_stream(self, stream: _GamepadStream):
+        snap = stream.reader.snapshot()
+        frame = stream.update(snap, float(self.manager.settings.gamepad_monitor_epsilon))
+        if frame is None:
+            return
+        self.frames += 1
+        self.bytes += len(frame) * len(stream.subscribers)
+        for sub in stream.subscribers:
+            sub.offer(frame)
+
     async def _loop(self):
         while self._running:
-            # Could push updates via WS here if needed
-            await asyncio.sleep(1.0)
+            if not self._streams:
+                await self._has_clients.wait()
+                self.ticker.reset()
+                continue
+            for stream in list(self._streams.values()):
+                try:
+                    self._tick_stream(stream)
+                except Exception as e:
+                    logger.warning(f"GamepadMonitor (mando {stream.index}): {e}")
+            rate = self.manager.settings.gamepad_monitor_hz
+            if self.ticker.rate_hz != rate:
+                self.ticker.set_rate(rate)
+            await self.ticker.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_hz": self.ticker.rate_hz,
+            "epsilon": self.manager.settings.gamepad_monitor_epsilon,
+            "clients": sum(len(s.subscribers) for s in self._streams.values()),
+            "gamepads": sorted(self._streams),
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "bytes": self.bytes,
+            "resyncs": sum(sub.resyncs for s in self._streams.values() for sub in s.subscribers),
+        }
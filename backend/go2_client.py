@@ -1,5 +1,9 @@
 # backend/go2_client.py
 import asyncio
+import secrets
+import time
+from contextlib import asynccontextmanager
+from time import monotonic
 from typing import Optional, Dict, Any
 
 from loguru import logger
@@ -7,8 +11,10 @@ from go2_webrtc_driver.webrtc_driver import Go2WebRTCConnection, WebRTCConnectio
 from go2_webrtc_driver.constants import RTC_TOPIC, SPORT_CMD
 from aiortc import MediaStreamTrack
 
-import cv2
-import numpy as np
+from .commands import PRIO_CMD, PRIO_MOVE, PRIO_STOP, STOP_COMMANDS, CommandScheduler, MoveFilter, MovePayload
+from .settings import Settings
+from .telemetry import Telemetry
+from .video import EncodedFrame, FrameHub, FrameSubscription, JpegEncoder, VariantCache, ws_video_message
 
 
 def parse_connection_method(method: str) -> WebRTCConnectionMethod:
@@ -31,8 +37,10 @@ class Go2Client:
     - estop_soft(), stand(), sit(), etc.
     - disconnect() -> apaga canal de vídeo
     Además, mantiene el último frame JPEG en memoria para servirlo por FastAPI.
+    La codificación JPEG se hace en un pool (JpegEncoder), nunca en el event loop.
     """
-    def __init__(self):
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or Settings()
         self.conn: Optional[Go2WebRTCConnection] = None
         self.method: Optional[WebRTCConnectionMethod] = None
         self.ip: Optional[str] = None
@@ -43,11 +51,39 @@ class Go2Client:
         self.serial: Optional[str] = None
 
         # ---------- Buffers de vídeo ----------
-        self._latest_jpeg: Optional[bytes] = None
-        self._jpeg_lock = asyncio.Lock()
-        self._frame_evt = asyncio.Event()
+        # Cada frame codificado se difunde con un seq monótono a colas por suscriptor
+        self._hub = FrameHub()
+        self._seq = 0
+        # Época del flujo: el seq vuelve a 1 en cada proceso/sesión, así un ETag o un
+        # ?after= de una época anterior no se confunde con un frame de ésta
+        self.video_epoch = secrets.token_hex(4)
         self._video_started = asyncio.Event()
         self._watchdog_task: Optional[asyncio.Task] = None
+        self._encoder: Optional[JpegEncoder] = None
+        self._variants: Optional[VariantCache] = None
+
+        # Canal único de comandos salientes (prioridades + Move latest-wins)
+        self._scheduler = CommandScheduler(
+            self._publish_now,
+            queue_size=self.settings.command_queue_size,
+            response_timeout=self.settings.command_response_timeout_s,
+        )
+
+        # Fast path del Move: topic resuelto y plantilla de payload preasignada
+        self._sport_topic = RTC_TOPIC["SPORT_MOD"]
+        self._move_payload = MovePayload(SPORT_CMD["Move"])
+
+        # Supresión de Move repetidos (opt-in: Settings.move_suppress)
+        self._move_filter = MoveFilter(self.settings.move_epsilon, self.settings.move_heartbeat_s)
+
+        # Consumidores de vídeo: sin nadie mirando solo se vacía track.recv()
+        self._video_lease_until = 0.0
+        self._frames_idle = 0
+        self._frames_received = 0
+        self._frames_skipped = 0
+
+        # Telemetría: topics de estado suscritos en cada conexión
+        self.telemetry = Telemetry(self.settings)
 
     # ---------------- Conexión ----------------
 
@@ -90,6 +126,13 @@ class Go2Client:
         await self.conn.connect()
         await asyncio.sleep(0.1)  # respiro como tu main.py
         logger.success("Conectado al Go2 por WebRTC")
+        self._move_filter.reset()
+        self._scheduler.start()
+
+        try:
+            self.telemetry.attach(self.conn)
+        except Exception as e:
+            logger.warning(f"No se pudo suscribir la telemetría: {e}")
 
         # === ACTIVAR VÍDEO Y REGISTRAR CALLBACK (como en el ejemplo) ===
         try:
@@ -99,17 +142,18 @@ class Go2Client:
             async def recv_camera_stream(track: MediaStreamTrack):
                 logger.info(f"📷 track recibido: kind={getattr(track, 'kind', '?')}")
                 self._video_started.set()
+                encoder = self._ensure_encoder()
                 while True:
                     frame = await track.recv()                          # aiortc VideoFrame
-                    img_bgr = frame.to_ndarray(format="bgr24")         # numpy BGR (como en tu ejemplo)
-                    ok, enc = cv2.imencode(".jpg", img_bgr)            # JPEG con OpenCV
-                    if not ok:
+                    # Etapa de recepción: salta siempre al frame más nuevo ya decodificado
+                    frame = self._drain_track(track, frame)
+                    self._frames_received += 1
+                    if not self.video_active():
+                        # Nadie mirando: drenamos el track y tiramos el frame
+                        self._frames_idle += 1
                         continue
-                    data = enc.tobytes()
-                    async with self._jpeg_lock:
-                        self._latest_jpeg = data
-                        self._frame_evt.set()
-                        self._frame_evt.clear()
+                    # BGR + JPEG en el pool; si va lento, gana el frame más nuevo
+                    encoder.submit(frame, monotonic())
 
             # La librería invoca el callback como función normal -> creamos una task en el loop
             def on_track(track: MediaStreamTrack):
@@ -130,6 +174,45 @@ class Go2Client:
         except Exception as e:
             logger.warning(f"No se pudo activar vídeo/callback: {e}")
 
+    def _ensure_encoder(self) -> JpegEncoder:
+        if self._encoder is None:
+            self._encoder = JpegEncoder(
+                self._on_jpeg,
+                mode=self.settings.video_encoder,
+                workers=self.settings.video_encoder_workers,
+                quality=self.settings.jpeg_quality,
+                max_age=self._max_frame_age(),
+            )
+            self._variants = VariantCache(self._encoder, capacity=self.settings.video_variant_cache)
+        self._encoder.start()
+        return self._encoder
+
+    def _max_frame_age(self) -> float:
+        return max(0.0, float(self.settings.video_max_age_ms)) / 1000.0
+
+    def _drain_track(self, track: MediaStreamTrack, frame):
+        """
+        Si el track ya tiene más frames decodificados en cola (aiortc RemoteStreamTrack),
+        se queda con el último y cuenta los saltados. Así la latencia no se acumula.
+        """
+        queue = getattr(track, "_queue", None)
+        if queue is None:
+            return frame
+        while not queue.empty():
+            nxt = queue.get_nowait()
+            if nxt is None:
+                # Fin del track: se devuelve a la cola para que el próximo recv() lo vea
+                queue.put_nowait(None)
+                break
+            self._frames_skipped += 1
+            frame = nxt
+        return frame
+
+    async def _on_jpeg(self, data: bytes, t_recv: float, img):
+        self._seq += 1
+        ts = time.time() - (monotonic() - t_recv)
+        self._hub.publish(EncodedFrame.build(seq=self._seq, t_recv=t_recv, ts=ts, jpeg=data), img)
+
     async def _video_watchdog(self):
         try:
             await asyncio.wait_for(self._video_started.wait(), timeout=5.0)
@@ -143,7 +226,9 @@ class Go2Client:
             pass
 
     async def disconnect(self):
+        await self._scheduler.stop()
         if self.conn:
+            self.telemetry.detach(self.conn)
             try:
                 try:
                     self.conn.video.switchVideoChannel(False)
@@ -158,6 +243,11 @@ class Go2Client:
         if self._watchdog_task:
             self._watchdog_task.cancel()
             self._watchdog_task = None
+        if self._encoder:
+            await self._encoder.close()
+            self._encoder = None
+        self._variants = None
+        self._hub.reset()
         self._video_started.clear()
 
     async def is_connected(self) -> bool:
@@ -165,10 +255,27 @@ class Go2Client:
 
     # ---------------- SPORT (comandos) ----------------
 
-    async def _publish(self, topic_key: str, payload: Dict[str, Any]):
+    async def _publish(self, topic_key: str, payload: Dict[str, Any], priority: int = PRIO_CMD) -> Optional[float]:
+        """
+        Todo comando pasa por el CommandScheduler (único escritor del datachannel).
+        Devuelve el perf_counter() del envío, o None si no se envió.
+        """
+        return await self._publish_topic(RTC_TOPIC[topic_key], payload, priority)
+
+    async def _publish_topic(self, topic: str, payload: Dict[str, Any], priority: int) -> Optional[float]:
         if not self.conn or not self.conn.datachannel:
-            return
-        await self.conn.datachannel.pub_sub.publish_request_new(RTC_TOPIC[topic_key], payload)
+            return None
+        if not self._scheduler.is_running():
+            await self._publish_now(topic, payload)
+            return None
+        if priority == PRIO_MOVE:
+            return await self._scheduler.submit_move(topic, payload)
+        return await self._scheduler.submit(topic, payload, priority)
+
+    async def _publish_now(self, topic: str, payload: Dict[str, Any]):
+        if not self.conn or not self.conn.datachannel:
+            raise ConnectionError("Datachannel no disponible")
+        return await self.conn.datachannel.pub_sub.publish_request_new(topic, payload)
 
     async def cmd(self, api_name: str, parameter: Optional[dict] = None):
         """Envía un SPORT_CMD simple por SPORT_MOD (igual que en tu script)."""
@@ -180,21 +287,50 @@ class Go2Client:
         payload = {"api_id": SPORT_CMD[api_name]}
         if parameter:
             payload["parameter"] = parameter
-        await self._publish("SPORT_MOD", payload)
+        if api_name in STOP_COMMANDS:
+            # tras una parada, el siguiente Move debe salir aunque sea igual al anterior
+            self._move_filter.reset()
+            await self._publish("SPORT_MOD", payload, PRIO_STOP)
+            return
+        await self._publish("SPORT_MOD", payload, PRIO_CMD)
 
     async def send_move(self, x: float, y: float, z: float):
-        """Move con parámetros x,y,z por SPORT_MOD (igual que tu main.py)."""
+        """
+        Move con parámetros x,y,z por SPORT_MOD (igual que tu main.py).
+        Con Settings.move_suppress sólo se envía si el comando cambia más de move_epsilon,
+        o como heartbeat cada move_heartbeat_s para mantener vivo el timeout del robot.
+        """
         if not self.conn or not self.conn.datachannel:
             return
-        payload = {
-            "api_id": SPORT_CMD["Move"],
-            "parameter": {"x": float(x), "y": float(y), "z": float(z)},
-        }
-        await self._publish("SPORT_MOD", payload)
+        f = self._move_filter
+        if self.settings.move_suppress:
+            f.epsilon = self.settings.move_epsilon
+            f.heartbeat_s = self.settings.move_heartbeat_s
+            if not f.should_send(x, y, z):
+                return
+        else:
+            f.sent += 1
+        payload = self._move_payload.fill(x, y, z)
+        return await self._publish_topic(self._sport_topic, payload, PRIO_MOVE)
 
     async def estop_soft(self):
         await self.cmd("StopMove")
 
+    @property
+    def scheduler(self) -> CommandScheduler:
+        return self._scheduler
+
+    @property
+    def move_filter(self) -> MoveFilter:
+        return self._move_filter
+
+    def command_stats(self) -> Dict[str, Any]:
+        return {
+            "move_suppress": self.settings.move_suppress,
+            "move": self._move_filter.stats(),
+            "scheduler": self._scheduler.stats(),
+        }
+
     async def stand(self):
         await self.cmd("StandUp")
 
@@ -222,16 +358,119 @@ class Go2Client:
 
     # ---------------- Vídeo (último frame) ----------------
 
-    async def get_latest_jpeg(self) -> Optional[bytes]:
-        async with self._jpeg_lock:
-            return self._latest_jpeg
-
-    async def wait_for_frame(self, timeout: float = 2.0) -> Optional[bytes]:
+    def _fresh(self, frame: Optional[EncodedFrame]) -> Optional[EncodedFrame]:
+        """None si el frame es más viejo que video_max_age_ms (no se sirve vídeo congelado)."""
+        if frame is None:
+            return None
+        max_age = self._max_frame_age()
+        if max_age > 0 and monotonic() - frame.t_recv > max_age:
+            return None
+        return frame
+
+    def latest_frame(self) -> Optional[EncodedFrame]:
+        return self._fresh(self._hub.latest)
+
+    async def frame_jpeg(self, frame: Optional[EncodedFrame], variant: Optional[tuple[int, int]] = None) -> Optional[bytes]:
+        """
+        JPEG de un frame del hub. variant=(ancho, calidad) devuelve esa variante,
+        codificada una sola vez por frame y compartida entre clientes.
+        """
+        frame = self._fresh(frame)
+        if frame is None:
+            return None
+        if variant is None:
+            return frame.jpeg
+        if self._variants is None:
+            return None
+        return await self._variants.get(frame.seq, self._hub.source_img(frame), variant)
+
+    async def frame_part(self, frame: Optional[EncodedFrame], variant: Optional[tuple[int, int]] = None) -> Optional[bytes]:
+        """Parte MJPEG ya construida (misma instancia de bytes para todos los visores)."""
+        frame = self._fresh(frame)
+        if frame is None:
+            return None
+        if variant is None:
+            return frame.part
+        if self._variants is None:
+            return None
+        entry = await self._variants.get_entry(frame.seq, self._hub.source_img(frame), variant)
+        return entry[1] if entry else None
+
+    async def frame_ws_message(self, frame: Optional[EncodedFrame], variant: Optional[tuple[int, int]] = None) -> Optional[bytes]:
+        """Mensaje binario de /ws/video (cabecera seq + timestamp de captura + JPEG)."""
+        frame = self._fresh(frame)
+        if frame is None:
+            return None
+        if variant is None:
+            return frame.ws_message
+        jpeg = await self.frame_jpeg(frame, variant)
+        return ws_video_message(frame.seq, frame.ts, jpeg) if jpeg else None
+
+    # ---------------- Vídeo (consumidores) ----------------
+
+    def video_active(self) -> bool:
+        return len(self._hub) > 0 or monotonic() < self._video_lease_until
+
+    def subscribe_video(self, name: str = "sub", maxsize: int = 2) -> FrameSubscription:
+        """Suscripción propia al hub; mientras exista, el pipeline de vídeo está activo."""
+        sub = self._hub.subscribe(name, maxsize)
+        if len(self._hub) == 1:
+            logger.debug("Vídeo activo (primer consumidor).")
+        return sub
+
+    def unsubscribe_video(self, sub: FrameSubscription):
+        sub.close()
+        if len(self._hub) == 0:
+            logger.debug("Vídeo sin consumidores de stream.")
+
+    @asynccontextmanager
+    async def video_subscriber(self, name: str = "sub", maxsize: int = 2):
+        """Suscripción al hub durante el bloque (mantiene la codificación activa)."""
+        sub = self.subscribe_video(name, maxsize)
         try:
-            await asyncio.wait_for(self._frame_evt.wait(), timeout=timeout)
-        except asyncio.TimeoutError:
-            pass
-        return await self.get_latest_jpeg()
+            yield sub
+        finally:
+            self.unsubscribe_video(sub)
+
+    def touch_video(self):
+        """Consumidor puntual (polling): mantiene el vídeo activo video_idle_grace_s segundos."""
+        self._video_lease_until = max(
+            self._video_lease_until, monotonic() + float(self.settings.video_idle_grace_s)
+        )
+
+    def video_stats(self) -> Dict[str, Any]:
+        return {
+            "state": "active" if self.video_active() else "idle",
+            "subscribers": len(self._hub),
+            "frames_idle": self._frames_idle,
+            "frames_received": self._frames_received,
+            "frames_skipped": self._frames_skipped,
+            "max_age_ms": self.settings.video_max_age_ms,
+            "hub": self._hub.stats(),
+            "encoder": self._encoder.stats() if self._encoder else None,
+            "variants": self._variants.stats() if self._variants else None,
+        }
+
+    async def next_frame(self, after: int, timeout: float) -> Optional[EncodedFrame]:
+        """
+        Primer frame con seq > after (el último si ya existe), o None si vence el timeout.
+        Un 'after' por delante del flujo (de otra época) se trata como 0: vale cualquier frame.
+        """
+        if after > self._seq:
+            after = 0
+        latest = self.latest_frame()
+        if latest is not None and latest.seq > after:
+            return latest
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout)
+        async with self.video_subscriber("wait", maxsize=1) as sub:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                frame = self._fresh(await sub.get(timeout=remaining))
+                if frame is not None and frame.seq > after:
+                    return frame
 
     async def set_mode(self, mode: str):
         from go2_webrtc_driver.proto import sport_command_pb2
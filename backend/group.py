@@ -0,0 +1,72 @@
+# backend/group.py
+import asyncio
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from .metrics import Histogram, MS_BUCKETS
+
+
+class RobotGroup:
+    """
+    Varios Go2Client tratados como uno: mismo interfaz que usa XboxTeleop
+    (send_move, cmd, estop_soft), así un único mando/bucle controla la formación.
+
+    Cada comando se publica a todos los miembros a la vez con asyncio.gather: cada
+    cliente lo deja en su propio CommandScheduler, de modo que un datachannel lento no
+    retrasa el envío a los demás. Con los instantes de envío (perf_counter) que devuelve
+    send_move se mide el skew de cada tick: el más tardío menos el más temprano.
+    """
+
+    def __init__(self, group_id: str, members: Dict[str, Any]):
+        self.group_id = group_id
+        self.members = dict(members)   # robot_id -> Go2Client
+
+        # Contadores
+        self.ticks = 0
+        self.partial = 0      # ticks en que algún miembro no envió (suprimido, caído, error)
+        self.errors = 0
+        self.last_skew_ms: Optional[float] = None
+        self.skew_ms = Histogram(MS_BUCKETS)
+
+    async def _broadcast(self, name: str, *args) -> list:
+        results = await asyncio.gather(
+            *(getattr(c, name)(*args) for c in self.members.values()),
+            return_exceptions=True,
+        )
+        for robot_id, r in zip(self.members, results):
+            if isinstance(r, BaseException):
+                self.errors += 1
+                logger.debug(f"[{self.group_id}] {name} falló en '{robot_id}': {r}")
+        return results
+
+    async def send_move(self, x: float, y: float, z: float) -> Optional[float]:
+        """Publica el Move en todos los miembros. Devuelve el instante del último envío."""
+        results = await self._broadcast("send_move", x, y, z)
+        sent = [r for r in results if isinstance(r, float)]
+        self.ticks += 1
+        if len(sent) < len(self.members):
+            self.partial += 1
+        if not sent:
+            return None
+        if len(sent) > 1:
+            self.last_skew_ms = (max(sent) - min(sent)) * 1000.0
+            self.skew_ms.observe(self.last_skew_ms)
+        return max(sent)
+
+    async def cmd(self, api_name: str, parameter: Optional[dict] = None):
+        await self._broadcast("cmd", api_name, parameter)
+
+    async def estop_soft(self):
+        await self._broadcast("estop_soft")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "group": self.group_id,
+            "members": list(self.members),
+            "ticks": self.ticks,
+            "partial": self.partial,
+            "errors": self.errors,
+            "last_skew_ms": self.last_skew_ms,
+            "skew_ms": self.skew_ms.snapshot(),
+        }
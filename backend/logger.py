@@ -1,44 +1,279 @@
-
 import asyncio
+import json
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from itertools import count
+from typing import Any, Dict, Iterable, Optional
+
 from loguru import logger
 
-# Simple WS broadcast for logs
-_ws_clients = set()
+# Cola acotada entre el sink de loguru (cualquier hilo) y un único drainer en el loop.
+# El drainer agrupa lo acumulado: una escritura de consola (en un hilo) y un mensaje
+# WS por lote, como mucho cada LOG_FLUSH_INTERVAL. Si la cola se llena se descartan
+# las líneas más viejas y se cuenta.
+LOG_QUEUE_MAX = 4096
+LOG_FLUSH_INTERVAL = 0.1     # s -> máx. ~10 lotes por segundo
+LOG_BATCH_MAX = 500          # líneas por mensaje WS
+
+# Difusión a /ws/logs: cada cliente tiene su buffer acotado y su propio writer, así un
+# navegador parado no retrasa a los demás ni al drainer.
+LOG_CLIENT_BUFFER = 64       # mensajes pendientes por cliente (se descartan los más viejos)
+LOG_SEND_TIMEOUT = 2.0       # s: un envío que no termina en este tiempo expulsa al cliente
+
+# Histórico en memoria de registros estructurados: al conectar, un cliente recibe los
+# últimos N que pasen su filtro (?level=&topic=).
+LOG_RING_SIZE = 2000
+LOG_BACKFILL_DEFAULT = 200
+
+# Cada registro lleva un seq creciente (el cliente deduplica histórico y directo con él,
+# no con la hora, que puede repetirse o ir hacia atrás). El seq vuelve a 1 al reiniciar
+# el proceso: la época, enviada en cada mensaje, le dice al cliente que empiece de cero.
+LOG_EPOCH = secrets.token_hex(4)
+_seqs = count(1)
+
+_ws_clients: Dict[Any, "_LogClient"] = {}
 _lock = asyncio.Lock()
+_evicted = 0
+
+_queue: deque[tuple[str, dict]] = deque()
+_ring: deque["LogRecord"] = deque(maxlen=LOG_RING_SIZE)
+_queue_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wake: Optional[asyncio.Event] = None
+_wake_pending = False
+_drainer: Optional[asyncio.Task] = None
+
+# Contadores
+_dropped = 0
+_batches = 0
+_lines = 0
 
 def setup_logging():
-    # Add a sink that echoes to stdout and schedules WS broadcast
-    def sink(msg):
-        text = msg if isinstance(msg, str) else msg.strip()
-        # schedule broadcast without awaiting
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                loop.create_task(_broadcast("log", text))
-        except RuntimeError:
-            # no loop, ignore
-            pass
-        # always print to console too
-        print(text)
     logger.remove()
-    logger.add(lambda m: sink(m), format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}")
+    logger.add(_sink, format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}")
+
+class LogRecord:
+    """
+    Registro estructurado. Su JSON se genera una sola vez y se comparte entre todos los
+    clientes (y el histórico); la línea formateada es la que va a consola.
+    topic = último componente del módulo que loguea (teleop, go2_client, server...).
+    seq = número de orden en el proceso (ver LOG_EPOCH).
+    """
+
+    __slots__ = ("seq", "no", "topic", "text", "json")
+
+    def __init__(self, t: float, level: str, no: int, topic: str, msg: str, text: str):
+        self.seq = next(_seqs)
+        self.no = no
+        self.topic = topic
+        self.text = text
+        self.json = json.dumps(
+            {"seq": self.seq, "t": t, "level": level, "topic": topic, "msg": msg}, ensure_ascii=False
+        )
+
+    @classmethod
+    def from_loguru(cls, text: str, record: dict) -> "LogRecord":
+        level = record["level"]
+        topic = (record["name"] or "").rsplit(".", 1)[-1]
+        return cls(record["time"].timestamp(), level.name, level.no, topic, record["message"], text)
+
+
+class LogFilter:
+    """Filtro por cliente: nivel mínimo y lista de topics (coma). Se evalúa en el servidor."""
+
+    __slots__ = ("min_no", "topics", "key")
+
+    def __init__(self, level: Optional[str] = None, topic: Optional[str] = None):
+        # logger.level() lanza ValueError si el nivel no existe
+        self.min_no = logger.level(level.upper()).no if level else 0
+        topics = frozenset(t.strip() for t in topic.split(",") if t.strip()) if topic else None
+        self.topics = topics or None
+        self.key = (self.min_no, self.topics)
+
+    def match(self, r: LogRecord) -> bool:
+        return r.no >= self.min_no and (self.topics is None or r.topic in self.topics)
+
+
+ALL_LOGS = LogFilter()
 
-async def _broadcast(kind: str, text: str):
+def _sink(msg):
+    global _dropped, _wake_pending
+    text = str(msg).rstrip("\n")
+    loop = _loop
+    if loop is None:
+        # Aún no hay drainer (arranque, scripts): directo a consola
+        print(text)
+        return
+    with _queue_lock:
+        if len(_queue) >= LOG_QUEUE_MAX:
+            _queue.popleft()
+            _dropped += 1
+        _queue.append((text, msg.record))
+        if _wake_pending:
+            return
+        _wake_pending = True
+    # Un único aviso al loop por lote, sea cual sea el hilo que loguea
+    loop.call_soon_threadsafe(_wake.set)
+
+def _take_pending() -> list[tuple[str, dict]]:
+    global _wake_pending
+    with _queue_lock:
+        _wake_pending = False
+        pending = list(_queue)
+        _queue.clear()
+    return pending
+
+def _write_console(lines: list[str]):
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+
+async def _drain():
+    global _batches, _lines
+    reported = 0
+    while True:
+        await _wake.wait()
+        _wake.clear()
+        records = [LogRecord.from_loguru(text, rec) for text, rec in _take_pending()]
+        dropped = _dropped
+        if dropped != reported:
+            msg = f"[logs] {dropped - reported} líneas descartadas (cola llena)"
+            records.append(LogRecord(time.time(), "WARNING", 30, "logs", msg, msg))
+            reported = dropped
+        if records:
+            _batches += 1
+            _lines += len(records)
+            _ring.extend(records)
+            await asyncio.to_thread(_write_console, [r.text for r in records])
+            for i in range(0, len(records), LOG_BATCH_MAX):
+                _broadcast(records[i:i + LOG_BATCH_MAX])
+        # Limita el ritmo: lo que llegue mientras tanto va en el siguiente lote
+        await asyncio.sleep(LOG_FLUSH_INTERVAL)
+
+async def start_log_drainer():
+    """Arranca el drainer en el loop actual; desde aquí el sink ya no escribe en el loop."""
+    global _loop, _wake, _drainer
+    if _drainer:
+        return
+    _wake = asyncio.Event()
+    _loop = asyncio.get_running_loop()
+    _drainer = asyncio.create_task(_drain())
+
+async def stop_log_drainer():
+    """Para el drainer y vuelca a consola lo pendiente; el sink vuelve a print directo."""
+    global _loop, _drainer
+    if not _drainer:
+        return
+    _loop = None
+    _drainer.cancel()
+    try:
+        await _drainer
+    except asyncio.CancelledError:
+        pass
+    _drainer = None
+    _write_console([text for text, _rec in _take_pending()])
+
+def log_stats() -> Dict[str, Any]:
+    return {
+        "queued": len(_queue),
+        "dropped": _dropped,
+        "batches": _batches,
+        "lines": _lines,
+        "ring": len(_ring),
+        "clients": len(_ws_clients),
+        "evicted": _evicted,
+        "client_dropped": sum(c.dropped for c in _ws_clients.values()),
+    }
+
+class _LogClient:
+    """Buffer de salida acotado + writer de un cliente /ws/logs."""
+
+    def __init__(self, ws, filt: LogFilter):
+        self.ws = ws
+        self.filter = filt
+        self.pending: deque[str] = deque()
+        self.wake = asyncio.Event()
+        self.task = asyncio.create_task(self._writer())
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, text: str):
+        if len(self.pending) >= LOG_CLIENT_BUFFER:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(text)
+        self.wake.set()
+
+    async def _writer(self):
+        while True:
+            if not self.pending:
+                self.wake.clear()
+                await self.wake.wait()
+                continue
+            text = self.pending.popleft()
+            try:
+                await asyncio.wait_for(self.ws.send_text(text), LOG_SEND_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await _evict(self, e)
+                return
+            self.sent += 1
+
+async def _evict(client: _LogClient, reason: Exception):
+    global _evicted
+    if _ws_clients.get(client.ws) is not client:
+        return
+    del _ws_clients[client.ws]
+    _evicted += 1
+    if isinstance(reason, asyncio.TimeoutError):
+        logger.warning(f"Cliente /ws/logs expulsado por lento ({len(client.pending)} mensajes pendientes).")
+    else:
+        logger.debug(f"Cliente /ws/logs cerrado al enviar: {type(reason).__name__}")
+    try:
+        await asyncio.wait_for(client.ws.close(code=1013), 1.0)
+    except Exception:
+        pass
+
+def _logs_message(records: Iterable[LogRecord]) -> str:
+    # Se concatenan los JSON ya hechos de cada registro: nada se serializa por cliente
+    return '{"type": "logs", "epoch": "' + LOG_EPOCH + '", "data": [' + ",".join(r.json for r in records) + "]}"
+
+def _broadcast(records: list[LogRecord]):
+    """Un mensaje por filtro distinto, compartido por sus clientes; nunca espera."""
     if not _ws_clients:
         return
-    dead = []
-    for ws in list(_ws_clients):
-        try:
-            await ws.send_text(text)
-        except Exception:
-            dead.append(ws)
-    for ws in dead:
-        _ws_clients.discard(ws)
+    by_filter: Dict[Any, str] = {}
+    for client in _ws_clients.values():
+        f = client.filter
+        text = by_filter.get(f.key)
+        if text is None:
+            selected = [r for r in records if f.match(r)]
+            text = by_filter[f.key] = _logs_message(selected) if selected else ""
+        if text:
+            client.offer(text)
 
-async def add_ws(ws):
+async def add_ws(ws, filt: Optional[LogFilter] = None, backfill: int = 0):
+    """Registra el cliente y le encola los últimos 'backfill' registros que pasan su filtro."""
+    filt = filt or ALL_LOGS
     async with _lock:
-        _ws_clients.add(ws)
+        if ws in _ws_clients:
+            return
+        client = _ws_clients[ws] = _LogClient(ws, filt)
+        if backfill > 0:
+            history = [r for r in _ring if filt.match(r)][-backfill:]
+            if history:
+                client.offer(_logs_message(history))
 
 async def remove_ws(ws):
     async with _lock:
-        _ws_clients.discard(ws)
+        client = _ws_clients.pop(ws, None)
+    if client is not None:
+        client.task.cancel()
+        try:
+            await client.task
+        except (asyncio.CancelledError, Exception):
+            pass
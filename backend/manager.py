@@ -1,21 +1,53 @@
+import asyncio
+import re
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Optional, Dict, Any
 
+from loguru import logger
+
+from .commands import PRIO_CMD, PRIO_MOVE, PRIO_STOP
+from .gamepad_input import GamepadReader
 from .go2_client import Go2Client
+from .group import RobotGroup
+from .metrics import PrometheusText
+from .recorder import VideoRecorder
 from .teleop import XboxTeleop
 from .settings import Settings
 
+DEFAULT_ROBOT = "default"
+ROBOT_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,32}$")   # también se usa como subdirectorio de grabación
+
 @dataclass
 class Status:
     running: bool
     gamepad_connected: bool
     config: dict
 
-class TeleopManager:
-    def __init__(self):
-        self.settings = Settings()
-        self.client = Go2Client()
-        self.teleop = XboxTeleop(client=self.client, settings=self.settings)
+class RobotBusy(RuntimeError):
+    """La teleop propia de un robot no puede arrancar: la controla un grupo en marcha."""
+
+
+class RobotSession:
+    """
+    Un robot: conexión, buffers de vídeo, scheduler de comandos, teleop y grabación
+    propios, con sus propios Settings. Las sesiones comparten el event loop; cada una
+    tiene su pool de codificación y su ticker (desfasado respecto a los demás).
+    """
+
+    def __init__(self, robot_id: str, settings: Settings, reader: Optional[GamepadReader] = None, phase: float = 0.0):
+        self.robot_id = robot_id
+        self.settings = settings
+        self.phase = phase
+        self.client = Go2Client(settings=self.settings)
+        self.teleop = XboxTeleop(client=self.client, settings=self.settings, reader=reader)
+        self.recorder = VideoRecorder(self.client, self.settings)
+        self.held_by: Optional[str] = None   # id del grupo en marcha que controla este robot
+
+    @property
+    def gamepad(self) -> Optional[int]:
+        reader = self.teleop.reader
+        return reader.index if reader is not None else None
 
     async def connect(self, method: Optional[str] = None, ip: Optional[str] = None):
         if method is None:
@@ -28,31 +60,100 @@ class TeleopManager:
         await self.client.disconnect()
 
     async def start(self):
-        await self.teleop.start()
+        if self.held_by is not None:
+            raise RobotBusy(f"El robot '{self.robot_id}' lo controla el grupo '{self.held_by}'")
+        await self.teleop.start(phase=self.phase)
 
     async def stop(self):
         await self.teleop.stop()
 
+    async def close(self):
+        for step in (self.recorder.stop, self.stop, self.disconnect):
+            try:
+                await step()
+            except Exception as e:
+                logger.warning(f"[{self.robot_id}] Error cerrando sesión: {e}")
+
     def status(self) -> Status:
         return Status(
             running=self.teleop.is_running(),
             gamepad_connected=self.teleop.connected(),
-            config=self.settings.model_dump(),
+            config=self.settings.model_dump(mode="json"),   # claves de hat_actions -> "x,y"
         )
 
+    def info(self) -> Dict[str, Any]:
+        return {
+            "robot": self.robot_id,
+            "method": self.settings.method,
+            "ip": self.settings.ip,
+            "connected": bool(self.client.conn),
+            "running": self.teleop.is_running(),
+            "gamepad": self.gamepad,
+            "group": self.held_by,
+            "recording": self.recorder.is_recording(),
+        }
+
     # ---- helpers para debug/config ----
 
     def gamepad_state(self) -> Dict[str, Any]:
-        n_axes = self.teleop.num_axes()
-        n_btns = max(12, self.teleop.num_buttons())
-        axes = [self.teleop.axis_raw(i) for i in range(n_axes)]
-        buttons = [self.teleop.button_state(i) for i in range(n_btns)]
+        # Un único snapshot: ejes y botones coherentes entre sí, sin llamar a SDL
+        snap = self.teleop.snapshot()
+        n_btns = max(12, len(snap.buttons))
+        axes = list(snap.axes)
+        buttons = [snap.button(i) for i in range(n_btns)]
         return {
             "connected": self.teleop.connected(),
             "axes": axes,
             "buttons": buttons,
         }
 
+    def write_metrics(self, out: PrometheusText, labels: Optional[Dict[str, Any]] = None):
+        """Vuelca contadores e histogramas en formato Prometheus (ver /metrics)."""
+        labels = dict(labels or {})
+        teleop, ticker = self.teleop, self.teleop.ticker
+        sched, move = self.client.scheduler, self.client.move_filter
+
+        out.gauge("teleop_running", int(teleop.is_running()), "1 si el bucle de teleop está en marcha.", labels)
+        out.gauge("gamepad_connected", int(teleop.connected()), "1 si hay mando detectado.", labels)
+        for stage, hist in teleop.latency.items():
+            out.histogram_ms("teleop_input_latency", hist,
+                             "Latencia lectura SDL -> transformación -> publicación del Move.",
+                             {**labels, "stage": stage})
+        out.histogram_ms("teleop_tick_jitter", ticker.jitter_ms, "Retraso de cada tick respecto a su deadline.", labels)
+        out.counter("teleop_ticks", ticker.ticks, "Ticks ejecutados del bucle de teleop.", labels)
+        out.counter("teleop_overruns", ticker.overruns, "Ticks que terminaron después del deadline siguiente.", labels)
+        out.counter("teleop_skipped_ticks", ticker.skipped, "Ticks saltados por exceder teleop_max_catchup.", labels)
+        out.counter("teleop_loop_errors", teleop.loop_errors, "Excepciones en el bucle de teleop.", labels)
+
+        for kind, prio in (("stop", PRIO_STOP), ("cmd", PRIO_CMD), ("move", PRIO_MOVE)):
+            out.counter("commands_published", sched.sent[prio], "Comandos enviados por el datachannel.",
+                        {**labels, "kind": kind})
+        out.counter("command_errors", sched.errors, "Comandos con respuesta de error del driver.", labels)
+        out.counter("command_timeouts", sched.timeouts, "Comandos sin respuesta dentro del timeout.", labels)
+        out.counter("move_suppressed", move.suppressed, "Move no enviados por la supresión de repetidos.", labels)
+        out.counter("move_coalesced", sched.coalesced, "Move sustituidos por uno más reciente antes de enviarse.", labels)
+        out.histogram_ms("command_queue_wait", sched.queue_wait_ms, "Espera en la cola de comandos hasta el envío.", labels)
+
+        actions = teleop.actions
+        for result in ("completed", "deduplicated", "superseded", "cancelled", "failed"):
+            out.counter("actions", getattr(actions, result), "Acciones de botones por resultado.",
+                        {**labels, "result": result})
+
+        reader = teleop.reader
+        if reader is not None:
+            out.counter("gamepad_events_dropped", reader.events_dropped, "Flancos del mando descartados por cola llena.", labels)
+
+        video = self.client.video_stats()
+        out.counter("video_frames_received", video["frames_received"], "Frames de vídeo recibidos del robot.", labels)
+        out.counter("video_frames_skipped", video["frames_skipped"], "Frames descartados por llegar otro más nuevo.", labels)
+        out.gauge("video_subscribers", video["subscribers"], "Consumidores de vídeo conectados.", labels)
+
+        telemetry = self.client.telemetry
+        for key, n in telemetry.received.items():
+            out.counter("telemetry_messages", n, "Mensajes de telemetría recibidos por topic.", {**labels, "topic": key})
+        for key, n in telemetry.errors.items():
+            out.counter("telemetry_errors", n, "Mensajes de telemetría que no se pudieron decodificar.", {**labels, "topic": key})
+
     def update_settings(self, patch: Dict[str, Any]) -> Dict[str, Any]:
         # actualiza solo las claves conocidas
         for k, v in patch.items():
@@ -65,4 +166,233 @@ class TeleopManager:
             self.teleop.ax_ly = self.settings.ls_y_axis if self.settings.ls_y_axis is not None else 1
         if hasattr(self.teleop, "ax_rx"):
             self.teleop.ax_rx = self.settings.yaw_axis  if self.settings.yaw_axis  is not None else 3
-        return self.settings.model_dump()
+        return self.settings.model_dump(mode="json")
+
+
+class GroupSession:
+    """
+    Un mando para varios robots: un único XboxTeleop cuyo 'client' es un RobotGroup.
+    Los ajustes de teleop (deadzone, velocidades, botones) son una copia de los del
+    primer miembro. Mientras el grupo está en marcha, la teleop propia de cada miembro
+    se para y no se puede volver a arrancar (RobotBusy), para que no compitan dos bucles
+    por el mismo Go2Client.
+    """
+
+    def __init__(self, group_id: str, members: list[RobotSession], settings: Settings, phase: float = 0.0):
+        self.group_id = group_id
+        self.members = members
+        self.settings = settings
+        self.phase = phase
+        self.group = RobotGroup(group_id, {m.robot_id: m.client for m in members})
+        self.teleop = XboxTeleop(client=self.group, settings=self.settings)
+
+    @property
+    def gamepad(self) -> Optional[int]:
+        reader = self.teleop.reader
+        return reader.index if reader is not None else None
+
+    async def start(self):
+        busy = [m.robot_id for m in self.members if m.held_by not in (None, self.group_id)]
+        if busy:
+            raise RobotBusy(f"Robots controlados por otro grupo: {', '.join(busy)}")
+        for m in self.members:
+            await m.stop()
+            m.held_by = self.group_id
+        await self.teleop.start(phase=self.phase)
+        if not self.teleop.is_running():   # p.ej. sin mando asignado
+            await self.stop()
+
+    async def stop(self):
+        await self.teleop.stop()
+        for m in self.members:
+            if m.held_by == self.group_id:
+                m.held_by = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "group": self.group_id,
+            "members": [m.robot_id for m in self.members],
+            "running": self.teleop.is_running(),
+            "gamepad": self.gamepad,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.info(), "broadcast": self.group.stats(), "timing": self.teleop.timing_stats()}
+
+    def write_metrics(self, out: PrometheusText):
+        labels = {"group": self.group_id}
+        g = self.group
+        out.histogram_ms("group_send_skew", g.skew_ms, "Diferencia entre el primer y el último envío del Move por tick.", labels)
+        out.counter("group_ticks", g.ticks, "Move difundidos al grupo.", labels)
+        out.counter("group_partial_ticks", g.partial, "Ticks en que algún miembro no envió el Move.", labels)
+        out.counter("group_errors", g.errors, "Errores de publicación en miembros del grupo.", labels)
+        out.counter("teleop_overruns", self.teleop.ticker.overruns,
+                    "Ticks que terminaron después del deadline siguiente.", labels)
+
+
+class TeleopManager:
+    """
+    Sesiones de robot por id en un único proceso/event loop.
+
+    - La sesión "default" usa self.settings y el mando 0 (comportamiento de siempre).
+    - Lectores de mando por índice, compartidos: un mando se asigna a un solo robot.
+    - Ticks de teleop desfasados entre sesiones (fase = posición / 8 del periodo) para
+      que 8 robots al mismo ritmo no publiquen todos en el mismo instante.
+    """
+
+    PHASE_SLOTS = 8
+
+    def __init__(self):
+        self.settings = Settings()
+        self._readers: Dict[int, GamepadReader] = {}
+        self.sessions: Dict[str, RobotSession] = {}
+        self.groups: Dict[str, GroupSession] = {}
+        self._slot = 0
+        self._add(DEFAULT_ROBOT, self.settings, gamepad=0)
+
+    # ---- sesiones ----
+
+    def get(self, robot_id: str = DEFAULT_ROBOT) -> RobotSession:
+        return self.sessions[robot_id]
+
+    def _next_phase(self) -> float:
+        phase = (self._slot % self.PHASE_SLOTS) / self.PHASE_SLOTS
+        self._slot += 1
+        return phase
+
+    def _add(self, robot_id: str, settings: Settings, gamepad: Optional[int]) -> RobotSession:
+        reader = self.reader(gamepad) if gamepad is not None else None
+        phase = self._next_phase()
+        session = RobotSession(robot_id, settings, reader=reader, phase=phase)
+        self.sessions[robot_id] = session
+        return session
+
+    async def add_robot(
+        self,
+        robot_id: str,
+        method: Optional[str] = None,
+        ip: Optional[str] = None,
+        gamepad: Optional[int] = None,
+    ) -> RobotSession:
+        if not ROBOT_ID_RE.match(robot_id):
+            raise ValueError(f"Id de robot no válido: {robot_id!r}")
+        if robot_id in self.sessions or robot_id in self.groups:
+            raise ValueError(f"El id '{robot_id}' ya existe")
+        patch: Dict[str, Any] = {"record_dir": str(Path(self.settings.record_dir) / robot_id)}
+        if method is not None:
+            patch["method"] = method
+        if ip is not None:
+            patch["ip"] = ip
+        settings = self.settings.model_copy(deep=True, update=patch)
+        session = self._add(robot_id, settings, gamepad=None)
+        if gamepad is not None:
+            await self.bind_gamepad(robot_id, gamepad)
+        logger.info(f"🤖 Robot '{robot_id}' añadido.")
+        return session
+
+    async def remove_robot(self, robot_id: str):
+        if robot_id == DEFAULT_ROBOT:
+            raise ValueError("La sesión por defecto no se puede eliminar")
+        session = self.sessions[robot_id]
+        for g in self.groups.values():
+            if session in g.members:
+                raise ValueError(f"El robot '{robot_id}' pertenece al grupo '{g.group_id}'")
+        del self.sessions[robot_id]
+        await session.close()
+        logger.info(f"🤖 Robot '{robot_id}' eliminado.")
+
+    # ---- grupos ----
+
+    async def add_group(self, group_id: str, members: list[str], gamepad: Optional[int] = None) -> GroupSession:
+        if not ROBOT_ID_RE.match(group_id):
+            raise ValueError(f"Id de grupo no válido: {group_id!r}")
+        if group_id in self.sessions or group_id in self.groups:
+            raise ValueError(f"El id '{group_id}' ya existe")
+        if len(set(members)) < 1 or len(set(members)) != len(members):
+            raise ValueError("El grupo necesita miembros distintos")
+        missing = [m for m in members if m not in self.sessions]
+        if missing:
+            raise ValueError(f"Robots inexistentes: {', '.join(missing)}")
+        sessions = [self.sessions[m] for m in members]
+        settings = sessions[0].settings.model_copy(deep=True)
+        group = GroupSession(group_id, sessions, settings, phase=self._next_phase())
+        self.groups[group_id] = group
+        if gamepad is not None:
+            await self.bind_gamepad(group_id, gamepad)
+        logger.info(f"🤖 Grupo '{group_id}': {', '.join(members)}")
+        return group
+
+    async def remove_group(self, group_id: str):
+        group = self.groups.pop(group_id)
+        await group.stop()
+        logger.info(f"🤖 Grupo '{group_id}' eliminado.")
+
+    def _target(self, target_id: str):
+        """Sesión de robot o de grupo (comparten teleop/start/stop/gamepad)."""
+        if target_id in self.groups:
+            return self.groups[target_id]
+        return self.sessions[target_id]
+
+    # ---- mandos ----
+
+    def reader(self, index: int) -> GamepadReader:
+        reader = self._readers.get(index)
+        if reader is None:
+            reader = self._readers[index] = GamepadReader(self.settings, index=index)
+            try:
+                reader.start(asyncio.get_running_loop())
+            except RuntimeError:
+                pass   # sin loop aún: lo arranca start_input()
+        return reader
+
+    def existing_reader(self, index: int) -> Optional[GamepadReader]:
+        """Lector ya creado (asignado o que lo estuvo); a diferencia de reader(), no crea ninguno."""
+        return self._readers.get(index)
+
+    def bindings(self) -> Dict[int, str]:
+        targets = {**self.sessions, **self.groups}
+        return {s.gamepad: tid for tid, s in targets.items() if s.gamepad is not None}
+
+    async def bind_gamepad(self, robot_id: str, gamepad: Optional[int]):
+        """Asigna el mando 'gamepad' al robot o grupo (None = lo libera). Un mando, un destino."""
+        target = self._target(robot_id)
+        if gamepad is not None:
+            owner = self.bindings().get(gamepad)
+            if owner is not None and owner != robot_id:
+                await self._set_reader(self._target(owner), None)
+        await self._set_reader(target, self.reader(gamepad) if gamepad is not None else None)
+        logger.info(f"🎮 Mando {gamepad} → robot '{robot_id}'" if gamepad is not None else f"🎮 Robot '{robot_id}' sin mando")
+
+    async def _set_reader(self, session, reader: Optional[GamepadReader]):
+        # El bucle de teleop toma el lector al arrancar: se reinicia si estaba en marcha
+        was_running = session.teleop.is_running()
+        if was_running:
+            await session.stop()
+        session.teleop.reader = reader
+        if was_running and reader is not None:
+            await session.start()
+
+    async def start_input(self):
+        """Arranca los lectores de mando (hilo SDL) aunque la teleop no esté en marcha."""
+        loop = asyncio.get_running_loop()
+        for reader in self._readers.values():
+            reader.start(loop)
+
+    def stop_input(self):
+        for reader in self._readers.values():
+            reader.stop()
+
+    async def shutdown(self):
+        for g in self.groups.values():
+            await g.stop()
+        await asyncio.gather(*(s.close() for s in self.sessions.values()))
+
+    def robots(self) -> list[Dict[str, Any]]:
+        return [s.info() for s in self.sessions.values()]
+
+    def write_metrics(self, out: PrometheusText):
+        out.gauge("robots", len(self.sessions), "Sesiones de robot abiertas.")
+        for robot_id, session in self.sessions.items():
+            session.write_metrics(out, {"robot": robot_id})
+        for group in self.groups.values():
+            group.write_metrics(out)
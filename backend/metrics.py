@@ -0,0 +1,124 @@
+# backend/metrics.py
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Optional
+
+
+class Histogram:
+    """
+    Histograma de buckets fijos (límites superiores, estilo Prometheus 'le').
+    observe() es O(log n) y no reserva memoria: apto para el bucle de teleop.
+    """
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self.counts = [0] * (len(self.buckets) + 1)   # el último es +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, v: float):
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.count += 1
+        self.sum += v
+        if v > self.max:
+            self.max = v
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """[(le, acumulado)] incluyendo +Inf."""
+        out, acc = [], 0
+        for le, c in zip(self.buckets + (float("inf"),), self.counts):
+            acc += c
+            out.append((le, acc))
+        return out
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Aproximación por el límite superior del bucket que contiene el cuantil."""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        for le, acc in self.cumulative():
+            if acc >= target:
+                return le if le != float("inf") else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p99": self.quantile(0.99),
+            "buckets": {("+Inf" if le == float("inf") else f"{le:g}"): acc for le, acc in self.cumulative()},
+        }
+
+
+# Buckets en milisegundos para tiempos de bucle / latencias cortas
+MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+# ---------- Exposición en formato texto de Prometheus ----------
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return f"{v:.9g}"
+
+
+def _fmt_labels(labels: Optional[Dict[str, Any]]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class PrometheusText:
+    """
+    Constructor mínimo del formato de exposición de texto de Prometheus (versión 0.0.4),
+    sin dependencias: un scraper cualquiera puede leer /metrics directamente.
+    Los histogramas internos están en ms; se exponen en segundos (convención Prometheus).
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, prefix: str = "go2_"):
+        self.prefix = prefix
+        # Las muestras de una misma métrica deben ir juntas: se agrupan por nombre
+        self._families: Dict[str, list[str]] = {}
+
+    def _declare(self, name: str, kind: str, help: str) -> list[str]:
+        lines = self._families.get(name)
+        if lines is None:
+            lines = self._families[name] = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        return lines
+
+    def counter(self, name: str, value: float, help: str, labels: Optional[Dict[str, Any]] = None):
+        name = f"{self.prefix}{name}_total"
+        self._declare(name, "counter", help).append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+
+    def gauge(self, name: str, value: float, help: str, labels: Optional[Dict[str, Any]] = None):
+        name = f"{self.prefix}{name}"
+        self._declare(name, "gauge", help).append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+
+    def histogram_ms(self, name: str, hist: Histogram, help: str, labels: Optional[Dict[str, Any]] = None):
+        """Histograma en ms expuesto como <name>_seconds."""
+        name = f"{self.prefix}{name}_seconds"
+        lines = self._declare(name, "histogram", help)
+        labels = dict(labels or {})
+        for le, acc in hist.cumulative():
+            le_s = le / 1000.0 if le != float("inf") else le
+            lines.append(f"{name}_bucket{_fmt_labels({**labels, 'le': _fmt_value(le_s)})} {acc}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(hist.sum / 1000.0)}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {hist.count}")
+
+    def render(self) -> str:
+        return "\n".join(line for lines in self._families.values() for line in lines) + "\n"
@@ -0,0 +1,127 @@
+# backend/profiling.py
+from time import perf_counter
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+# Etapas de un tick de XboxTeleop._loop (el índice es la columna del ring buffer)
+TICK_STAGES = ("pump", "events", "axes", "log", "transform", "publish")
+STAGE_PUMP, STAGE_EVENTS, STAGE_AXES, STAGE_LOG, STAGE_TRANSFORM, STAGE_PUBLISH = range(len(TICK_STAGES))
+
+
+class StageProfiler:
+    """
+    Temporizadores por etapa de cada tick en un ring buffer NumPy de tamaño fijo.
+
+    Uso en el bucle: begin() al empezar el tick, mark(etapa) al terminar cada etapa
+    (acumula el tiempo desde la marca anterior) y end() al cerrar el tick. Desactivado,
+    cada llamada es un único test de booleano: no se reserva memoria ni se llama al reloj.
+
+    Hay una fila de más para el tick en curso: lo que se vuelca son siempre ticks
+    completos, aunque se pida a mitad de uno (el tick cede el loop al publicar).
+    """
+
+    def __init__(self, stages: Iterable[str] = TICK_STAGES, capacity: int = 2048):
+        self.stages = tuple(stages)
+        self.capacity = max(1, int(capacity))
+        self.enabled = False
+
+        rows = self.capacity + 1
+        self._t0 = np.zeros(rows, dtype=np.float64)                       # perf_counter() de inicio
+        self._dur = np.zeros((rows, len(self.stages)), dtype=np.float64)  # segundos por etapa
+        self._n = 0          # ticks completados
+        self._row = -1       # fila abierta (-1: ninguna)
+        self._mark = 0.0
+
+    def reset(self):
+        self._n = 0
+        self._row = -1
+
+    # ---------- Bucle ----------
+
+    def begin(self):
+        if not self.enabled:
+            self._row = -1
+            return
+        row = self._n % len(self._t0)
+        self._dur[row] = 0.0
+        self._t0[row] = self._mark = perf_counter()
+        self._row = row
+
+    def mark(self, stage: int):
+        if self._row < 0:
+            return
+        now = perf_counter()
+        self._dur[self._row, stage] += now - self._mark
+        self._mark = now
+
+    def end(self):
+        if self._row < 0:
+            return
+        self._row = -1
+        self._n += 1
+
+    # ---------- Volcado ----------
+
+    def _window(self, last: Optional[int]) -> np.ndarray:
+        """Índices de fila de los últimos ticks completos, del más viejo al más nuevo."""
+        count = min(self._n, self.capacity)
+        if last is not None:
+            count = min(count, max(0, int(last)))
+        return np.arange(self._n - count, self._n) % len(self._t0)
+
+    def summary(self, last: Optional[int] = None) -> Dict[str, Any]:
+        rows = self._window(last)
+        out: Dict[str, Any] = {"enabled": self.enabled, "ticks": int(len(rows)), "stages_ms": {}}
+        if len(rows) == 0:
+            return out
+        dur = self._dur[rows] * 1000.0
+        total = dur.sum(axis=1)
+        for i, name in enumerate(self.stages + ("total",)):
+            col = dur[:, i] if i < len(self.stages) else total
+            out["stages_ms"][name] = {
+                "mean": float(col.mean()),
+                "p50": float(np.percentile(col, 50)),
+                "p99": float(np.percentile(col, 99)),
+                "max": float(col.max()),
+            }
+        return out
+
+    def ticks(self, last: Optional[int] = None) -> list[Dict[str, Any]]:
+        rows = self._window(last)
+        out = []
+        for t0, dur in zip(self._t0[rows].tolist(), (self._dur[rows] * 1000.0).tolist()):
+            out.append({
+                "t": t0,
+                "total_ms": sum(dur),
+                "stages_ms": dict(zip(self.stages, dur)),
+            })
+        return out
+
+    def chrome_trace(self, last: Optional[int] = None, name: str = "teleop") -> Dict[str, Any]:
+        """Formato Trace Event (chrome://tracing, Perfetto): un evento 'X' por etapa y tick."""
+        rows = self._window(last)
+        events = [
+            {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": name}},
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "tick"}},
+        ]
+        if len(rows) == 0:
+            return {"traceEvents": events, "displayTimeUnit": "ms"}
+        t0 = self._t0[rows]
+        dur = self._dur[rows]
+        # Inicio de cada etapa = inicio del tick + duración acumulada de las anteriores
+        starts = t0[:, None] + np.cumsum(dur, axis=1) - dur
+        base = t0[0]
+        for k in range(len(rows)):
+            events.append({
+                "name": "tick", "cat": name, "ph": "X", "pid": 1, "tid": 1,
+                "ts": float(t0[k] - base) * 1e6, "dur": float(dur[k].sum()) * 1e6,
+            })
+            for i, stage in enumerate(self.stages):
+                if dur[k, i] <= 0.0:
+                    continue
+                events.append({
+                    "name": stage, "cat": name, "ph": "X", "pid": 1, "tid": 1,
+                    "ts": float(starts[k, i] - base) * 1e6, "dur": float(dur[k, i]) * 1e6,
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
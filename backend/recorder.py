@@ -0,0 +1,351 @@
+# backend/recorder.py
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional
+
+from loguru import logger
+
+from .video import EncodedFrame, FrameSubscription
+
+# ---------- Formato de segmento (append-only) ----------
+#
+#   seg_<inicio_ms>.g2v : SEGMENT_MAGIC + [RECORD + JPEG] * N
+#   seg_<inicio_ms>.g2i : [INDEX_ENTRY] * N   (timestamp -> offset del RECORD en el .g2v)
+#
+# Todo little-endian y de tamaño fijo, así el índice se puede buscar por bisección
+# directamente sobre un mmap sin parsear el fichero entero.
+
+SEGMENT_MAGIC = b"G2V1"
+SEGMENT_SUFFIX = ".g2v"
+INDEX_SUFFIX = ".g2i"
+RECORD = struct.Struct("<QdI")       # seq u64, ts f64 (time.time()), len u32
+INDEX_ENTRY = struct.Struct("<dQ")   # ts f64, offset u64
+
+
+def list_segments(directory: Path) -> list[Path]:
+    """Segmentos ordenados por instante de inicio (nombre)."""
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(f"seg_*{SEGMENT_SUFFIX}"))
+
+
+def index_path(segment: Path) -> Path:
+    return segment.with_suffix(INDEX_SUFFIX)
+
+
+class VideoRecorder:
+    """
+    Grabación de los frames JPEG publicados por Go2Client en segmentos rotatorios.
+
+    - Se suscribe al FrameHub con una cola acotada: si el disco va lento se pierden
+      frames de la grabación (contados), nunca se bloquea la entrega al resto.
+    - Un único writer agrupa lo que haya en cola y escribe en un hilo (asyncio.to_thread).
+    - Rotación por tamaño de segmento y retención por tamaño total (borra los más viejos
+      al rotar, así que el segmento en curso puede sumar hasta record_segment_mb más).
+    """
+
+    def __init__(self, client, settings):
+        self.client = client
+        self.settings = settings
+
+        self._sub: Optional[FrameSubscription] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Estado del writer (sólo se toca desde el hilo de escritura)
+        self._seg_file: Optional[BinaryIO] = None
+        self._idx_file: Optional[BinaryIO] = None
+        self._seg_path: Optional[Path] = None
+        self._seg_size = 0
+        self._io_lock = threading.Lock()
+
+        # Contadores
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.batches = 0
+        self.segments_deleted = 0
+        self.started_at: Optional[float] = None
+
+    @property
+    def directory(self) -> Path:
+        return Path(self.settings.record_dir)
+
+    def is_recording(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        if self._task:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sub = self.client.subscribe_video("rec", maxsize=self.settings.record_queue)
+        self.started_at = time.time()
+        self._task = asyncio.create_task(self._writer())
+        logger.info(f"🎞️ Grabación iniciada en {self.directory}")
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._sub:
+            self.client.unsubscribe_video(self._sub)
+        await asyncio.to_thread(self._close_segment)
+        self.started_at = None
+        logger.info(f"🎞️ Grabación detenida ({self.frames_written} frames).")
+
+    async def _writer(self):
+        sub = self._sub
+        while True:
+            frame = await sub.get()
+            batch = [frame]
+            while not sub.queue.empty():
+                batch.append(await sub.get())
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Fallo escribiendo grabación: {e}")
+
+    # ---------- Hilo de escritura ----------
+
+    def _open_segment(self, ts: float):
+        name = f"seg_{int(ts * 1000):013d}"
+        self._seg_path = self.directory / f"{name}{SEGMENT_SUFFIX}"
+        self._seg_file = open(self._seg_path, "ab")
+        self._idx_file = open(index_path(self._seg_path), "ab")
+        if self._seg_file.tell() == 0:
+            self._seg_file.write(SEGMENT_MAGIC)
+        self._seg_size = self._seg_file.tell()
+
+    def _close_segment(self):
+        with self._io_lock:
+            self._close_segment_locked()
+
+    def _close_segment_locked(self):
+        for f in (self._seg_file, self._idx_file):
+            if f:
+                f.close()
+        self._seg_file = None
+        self._idx_file = None
+        self._seg_path = None
+        self._seg_size = 0
+
+    def _write_batch(self, batch: list[EncodedFrame]):
+        # Una task cancelada no para su hilo: el lock evita solaparse con stop()
+        with self._io_lock:
+            self._write_batch_locked(batch)
+
+    def _write_batch_locked(self, batch: list[EncodedFrame]):
+        seg_limit = int(self.settings.record_segment_mb) * 1024 * 1024
+        for frame in batch:
+            size = RECORD.size + len(frame.jpeg)
+            if self._seg_file is None or (self._seg_size + size > seg_limit and self._seg_size > len(SEGMENT_MAGIC)):
+                self._close_segment_locked()
+                self._open_segment(frame.ts)
+                self._enforce_retention()
+            offset = self._seg_size
+            self._seg_file.write(RECORD.pack(frame.seq, frame.ts, len(frame.jpeg)))
+            self._seg_file.write(frame.jpeg)
+            self._idx_file.write(INDEX_ENTRY.pack(frame.ts, offset))
+            self._seg_size += size
+            self.frames_written += 1
+            self.bytes_written += size
+        # El índice se vuelca después de los datos: nunca apunta a un record incompleto
+        self._seg_file.flush()
+        self._idx_file.flush()
+        self.batches += 1
+
+    def _enforce_retention(self):
+        max_bytes = int(self.settings.record_max_mb) * 1024 * 1024
+        segments = list_segments(self.directory)
+        sizes = {p: _size_or_zero(p) + _size_or_zero(index_path(p)) for p in segments}
+        total = sum(sizes.values())
+        for p in segments:
+            if total <= max_bytes or p == self._seg_path:
+                break
+            for f in (p, index_path(p)):
+                try:
+                    os.remove(f)
+                except FileNotFoundError:
+                    pass
+            total -= sizes[p]
+            self.segments_deleted += 1
+            logger.debug(f"Retención: borrado {p.name}")
+
+    def status(self) -> Dict[str, Any]:
+        segments = list_segments(self.directory)
+        return {
+            "recording": self.is_recording(),
+            "directory": str(self.directory),
+            "started_at": self.started_at,
+            "current_segment": self._seg_path.name if self._seg_path else None,
+            "segments": len(segments),
+            "disk_bytes": sum(_size_or_zero(p) + _size_or_zero(index_path(p)) for p in segments),
+            "frames_written": self.frames_written,
+            "bytes_written": self.bytes_written,
+            "batches": self.batches,
+            "frames_dropped": self._sub.dropped if self._sub else 0,
+            "segments_deleted": self.segments_deleted,
+        }
+
+
+def _size_or_zero(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+# ---------- Lectura / reproducción ----------
+
+class SegmentReader:
+    """
+    Lee un segmento grabado con mmap: ni el índice ni los JPEG se cargan enteros en RAM,
+    el kernel pagina bajo demanda y sólo se copia el frame que se va a enviar.
+    El segmento en curso se puede leer mientras se graba (se ve lo volcado al abrir).
+    """
+
+    def __init__(self, segment: Path):
+        self.path = segment
+        self._seg_f = open(segment, "rb")
+        self._idx_f = open(index_path(segment), "rb")
+        # Índice antes que datos: el grabador escribe el frame y luego su entrada, así lo
+        # indexado al mapear el índice ya está en el segmento al mapearlo después
+        self._idx = _mmap_or_none(self._idx_f)
+        self._seg = _mmap_or_none(self._seg_f)
+        if self._seg is None or self._seg[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+            self.close()
+            raise ValueError(f"Segmento no válido: {segment.name}")
+        self.count = len(self._idx) // INDEX_ENTRY.size if self._idx is not None else 0
+        # Aun así, sólo entradas cuyo registro completo cabe en lo mapeado
+        while self.count and not self._complete(self.entry(self.count - 1)[1]):
+            self.count -= 1
+
+    def _complete(self, offset: int) -> bool:
+        end = offset + RECORD.size
+        if end > len(self._seg):
+            return False
+        length = RECORD.unpack_from(self._seg, offset)[2]
+        return end + length <= len(self._seg)
+
+    def entry(self, i: int) -> tuple[float, int]:
+        return INDEX_ENTRY.unpack_from(self._idx, i * INDEX_ENTRY.size)
+
+    def bisect(self, ts: float) -> int:
+        """Primer índice con timestamp >= ts."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.entry(mid)[0] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def read(self, offset: int) -> tuple[int, float, bytes]:
+        seq, ts, length = RECORD.unpack_from(self._seg, offset)
+        start = offset + RECORD.size
+        return seq, ts, self._seg[start:start + length]
+
+    def close(self):
+        for m in (self._seg, self._idx):
+            if m is not None:
+                m.close()
+        self._seg_f.close()
+        self._idx_f.close()
+
+
+def _mmap_or_none(f: BinaryIO) -> Optional[mmap.mmap]:
+    # mmap no admite ficheros vacíos
+    if os.fstat(f.fileno()).st_size == 0:
+        return None
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def segment_range(segment: Path) -> Optional[tuple[float, float, int]]:
+    """(ts primero, ts último, nº frames) leyendo sólo la primera y la última entrada del índice."""
+    size = _size_or_zero(index_path(segment))
+    count = size // INDEX_ENTRY.size
+    if count == 0:
+        return None
+    with open(index_path(segment), "rb") as f:
+        first = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))[0]
+        f.seek((count - 1) * INDEX_ENTRY.size)
+        last = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))[0]
+    return first, last, count
+
+
+def list_recordings(directory: Path) -> list[Dict[str, Any]]:
+    out = []
+    for seg in list_segments(directory):
+        rng = segment_range(seg)
+        if rng is None:
+            continue
+        out.append({
+            "segment": seg.name,
+            "from": rng[0],
+            "to": rng[1],
+            "frames": rng[2],
+            "bytes": _size_or_zero(seg),
+        })
+    return out
+
+
+def _read_span(segment: Path, t_from: float, t_to: float, start: int, limit: int):
+    """Hasta 'limit' frames del segmento desde el índice 'start' (o desde t_from si start<0)."""
+    reader = SegmentReader(segment)
+    try:
+        i = reader.bisect(t_from) if start < 0 else start
+        frames = []
+        while i < reader.count and len(frames) < limit:
+            ts, offset = reader.entry(i)
+            if ts > t_to:
+                return frames, -1
+            frames.append(reader.read(offset))
+            i += 1
+        return frames, (i if i < reader.count else -1)
+    finally:
+        reader.close()
+
+
+async def replay_frames(
+    directory: Path,
+    t_from: float,
+    t_to: float,
+    speed: float = 1.0,
+    chunk: int = 16,
+) -> AsyncIterator[tuple[int, float, bytes]]:
+    """
+    Frames (seq, ts, jpeg) grabados entre t_from y t_to, al ritmo original / speed
+    (speed <= 0: lo más rápido posible). El seek usa el índice; la lectura va por mmap
+    en un hilo, de 'chunk' en 'chunk' frames, para no bloquear el event loop.
+    """
+    loop = asyncio.get_running_loop()
+    t0_wall: Optional[float] = None
+    t0_rec = 0.0
+    for seg in list_segments(directory):
+        rng = await asyncio.to_thread(segment_range, seg)
+        if rng is None or rng[1] < t_from or rng[0] > t_to:
+            continue
+        pos = -1
+        while True:
+            frames, pos = await asyncio.to_thread(_read_span, seg, t_from, t_to, pos, chunk)
+            for seq, ts, jpeg in frames:
+                if t0_wall is None:
+                    t0_wall, t0_rec = loop.time(), ts
+                elif speed > 0:
+                    delay = t0_wall + (ts - t0_rec) / speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                yield seq, ts, jpeg
+            if pos < 0:
+                break
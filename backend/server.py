@@ -9,16 +9,22 @@ try:
 except Exception:
     pass
 
-from fastapi import FastAPI, WebSocket, Body, Response
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, WebSocket, Body, Response, Query, Request, Depends, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import StreamingResponse
 from pydantic import BaseModel
 from loguru import logger
 
-from .logger import setup_logging, add_ws, remove_ws
-from .manager import TeleopManager
+from .logger import (
+    LOG_BACKFILL_DEFAULT, LOG_RING_SIZE, LogFilter,
+    setup_logging, add_ws, remove_ws, log_stats, start_log_drainer, stop_log_drainer,
+)
+from .manager import DEFAULT_ROBOT, RobotBusy, RobotSession, TeleopManager
+from .metrics import PrometheusText
 from .gamepad_monitor import GamepadMonitor
+from .video import MJPEG_BOUNDARY, MJPEG_KEEPALIVE, mjpeg_part, parse_variant, ws_video_message
+from .recorder import list_recordings, replay_frames
 
 app = FastAPI(title="Go2 Xbox Control")
 setup_logging()
@@ -35,8 +41,18 @@ INDEX_HTML = STATIC_DIR / "index.html"
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 
+def get_session(robot: str = Query(DEFAULT_ROBOT, description="Id del robot (sesión)")) -> RobotSession:
+    """Sesión del robot indicado en ?robot= (por defecto la sesión 'default')."""
+    try:
+        return manager.get(robot)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Robot '{robot}' no existe")
+
+
 @app.on_event("startup")
 async def startup_event():
+    await start_log_drainer()
+    await manager.start_input()
     await monitor.start()
     logger.info("GamepadMonitor arrancado en el loop de FastAPI.")
 
@@ -44,18 +60,16 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     try:
-        await manager.stop()
-    except Exception:
-        pass
-    try:
-        await manager.disconnect()
+        await manager.shutdown()
     except Exception:
         pass
     try:
         await monitor.stop()
     except Exception:
         pass
+    manager.stop_input()
     logger.info("Shutdown completo.")
+    await stop_log_drainer()
 
 
 # ---------- Modelos ----------
@@ -72,6 +86,20 @@ class MoveBody(BaseModel):
 class YawBody(BaseModel):
     wz: float
 
+class RobotBody(BaseModel):
+    id: str
+    method: str | None = None
+    ip: str | None = None
+    gamepad: int | None = None
+
+class GamepadBindBody(BaseModel):
+    gamepad: int | None = None
+
+class GroupBody(BaseModel):
+    id: str
+    members: list[str]
+    gamepad: int | None = None
+
 
 # ---------- Rutas API ----------
 
@@ -81,21 +109,115 @@ async def index():
 
 
 @app.get("/api/status")
-async def api_status():
-    s = manager.status()
+async def api_status(session: RobotSession = Depends(get_session)):
+    s = session.status()
     return JSONResponse({
+        "robot": session.robot_id,
+        "gamepad": session.gamepad,
         "running": s.running,
         "gamepad_connected": s.gamepad_connected,
         "config": s.config,
+        "video": session.client.video_stats(),
+        "commands": session.client.command_stats(),
     })
 
 
+@app.get("/api/robots")
+async def api_robots():
+    """Sesiones abiertas y asignación mando -> robot."""
+    return JSONResponse({"robots": manager.robots(), "bindings": manager.bindings()})
+
+
+@app.post("/api/robots")
+async def api_add_robot(body: RobotBody):
+    try:
+        session = await manager.add_robot(body.id, method=body.method, ip=body.ip, gamepad=body.gamepad)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse({"ok": True, "robot": session.info()})
+
+
+@app.delete("/api/robots/{robot_id}")
+async def api_remove_robot(robot_id: str):
+    try:
+        await manager.remove_robot(robot_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Robot '{robot_id}' no existe")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse({"ok": True})
+
+
+@app.get("/api/groups")
+async def api_groups():
+    return JSONResponse({"groups": [g.info() for g in manager.groups.values()], "bindings": manager.bindings()})
+
+
+@app.post("/api/groups")
+async def api_add_group(body: GroupBody):
+    """Grupo de robots controlado por un único mando (Move difundido a todos)."""
+    try:
+        group = await manager.add_group(body.id, body.members, gamepad=body.gamepad)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse({"ok": True, "group": group.info()})
+
+
+def get_group(group_id: str):
+    try:
+        return manager.groups[group_id]
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Grupo '{group_id}' no existe")
+
+
+@app.delete("/api/groups/{group_id}")
+async def api_remove_group(group_id: str):
+    get_group(group_id)
+    await manager.remove_group(group_id)
+    return JSONResponse({"ok": True})
+
+
+@app.post("/api/groups/{group_id}/start")
+async def api_group_start(group_id: str):
+    try:
+        await get_group(group_id).start()
+    except RobotBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return JSONResponse({"ok": True})
+
+
+@app.post("/api/groups/{group_id}/stop")
+async def api_group_stop(group_id: str):
+    await get_group(group_id).stop()
+    return JSONResponse({"ok": True})
+
+
+@app.post("/api/groups/{group_id}/gamepad")
+async def api_group_gamepad(group_id: str, body: GamepadBindBody):
+    get_group(group_id)
+    await manager.bind_gamepad(group_id, body.gamepad)
+    return JSONResponse({"ok": True, "bindings": manager.bindings()})
+
+
+@app.get("/api/groups/{group_id}/stats")
+async def api_group_stats(group_id: str):
+    """Difusión del grupo: ticks, envíos parciales, errores y skew entre miembros por tick."""
+    return JSONResponse(get_group(group_id).stats())
+
+
+@app.post("/api/gamepad/bind")
+async def api_gamepad_bind(body: GamepadBindBody, session: RobotSession = Depends(get_session)):
+    """Asigna el mando body.gamepad (índice SDL) al robot ?robot= (null lo libera)."""
+    await manager.bind_gamepad(session.robot_id, body.gamepad)
+    return JSONResponse({"ok": True, "bindings": manager.bindings()})
+
+
 @app.post("/api/connect")
-async def api_connect(body: ConnectBody):
-    await manager.connect(body.method, body.ip)
+async def api_connect(body: ConnectBody, session: RobotSession = Depends(get_session)):
+    await session.connect(body.method, body.ip)
     # AUTOSTART teleop tras conexión
     try:
-        await manager.start()
+        await session.start()
         logger.info("Teleop auto-iniciada tras la conexión.")
     except Exception as e:
         logger.warning(f"No se pudo autoiniciar teleop: {e}")
@@ -103,121 +225,426 @@ async def api_connect(body: ConnectBody):
 
 
 @app.post("/api/disconnect")
-async def api_disconnect():
-    await manager.disconnect()
+async def api_disconnect(session: RobotSession = Depends(get_session)):
+    await session.disconnect()
     return JSONResponse({"ok": True})
 
 
 @app.post("/api/teleop/start")
-async def api_start():
-    await manager.start()
+async def api_start(session: RobotSession = Depends(get_session)):
+    try:
+        await session.start()
+    except RobotBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
     return JSONResponse({"ok": True})
 
 
 @app.post("/api/teleop/stop")
-async def api_stop():
-    await manager.stop()
+async def api_stop(session: RobotSession = Depends(get_session)):
+    await session.stop()
     return JSONResponse({"ok": True})
 
 
+@app.get("/api/teleop/timing")
+async def api_teleop_timing(session: RobotSession = Depends(get_session)):
+    """Ritmo real del bucle de teleop: ticks, catch-ups, saltos e histograma de jitter."""
+    return JSONResponse(session.teleop.timing_stats())
+
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de texto Prometheus (sin colector externo)."""
+    out = PrometheusText()
+    manager.write_metrics(out)
+    logs = log_stats()
+    out.counter("log_lines", logs["lines"], "Líneas de log entregadas por el drainer.")
+    out.counter("log_lines_dropped", logs["dropped"], "Líneas de log descartadas por cola llena.")
+    out.gauge("log_clients", logs["clients"], "Clientes conectados a /ws/logs.")
+    out.counter("log_clients_evicted", logs["evicted"], "Clientes /ws/logs expulsados por no leer a tiempo.")
+    return PlainTextResponse(out.render(), media_type=PrometheusText.CONTENT_TYPE)
+
+
+@app.get("/api/teleop/profile")
+async def api_teleop_profile(
+    format: str = Query("json", pattern="^(json|chrome)$"),
+    last: int = Query(256, ge=1),
+    session: RobotSession = Depends(get_session),
+):
+    """
+    Últimos ticks del perfil por etapas (activar con teleop_profile en POST /api/settings).
+    format=chrome devuelve Trace Event JSON para chrome://tracing o Perfetto.
+    """
+    prof = session.teleop.profiler
+    if format == "chrome":
+        return JSONResponse(prof.chrome_trace(last))
+    return JSONResponse({**prof.summary(last), "recent": prof.ticks(last)})
+
+
+@app.get("/api/teleop/actions")
+async def api_teleop_actions(session: RobotSession = Depends(get_session)):
+    """Cola de acciones de botones: en curso, deduplicadas, superadas y latencia por acción."""
+    return JSONResponse(session.teleop.action_stats())
+
+
 @app.post("/api/stand")
-async def api_stand():
-    await manager.client.stand()
+async def api_stand(session: RobotSession = Depends(get_session)):
+    await session.client.stand()
     return JSONResponse({"ok": True})
 
 
 @app.post("/api/sit")
-async def api_sit():
-    await manager.client.sit()
+async def api_sit(session: RobotSession = Depends(get_session)):
+    await session.client.sit()
     return JSONResponse({"ok": True})
 
 
 @app.post("/api/stop")
-async def api_stop_move():
-    await manager.client.estop_soft()
+async def api_stop_move(session: RobotSession = Depends(get_session)):
+    await session.client.estop_soft()
     return JSONResponse({"ok": True})
 
 
 @app.post("/api/move")
-async def api_move(body: MoveBody):
-    await manager.client.send_move(body.x, body.y, body.z)
+async def api_move(body: MoveBody, session: RobotSession = Depends(get_session)):
+    await session.client.send_move(body.x, body.y, body.z)
     return JSONResponse({"ok": True})
 
 
 @app.post("/api/yaw")
-async def api_yaw(body: YawBody):
-    await manager.client.send_move(0.0, 0.0, body.wz)
+async def api_yaw(body: YawBody, session: RobotSession = Depends(get_session)):
+    await session.client.send_move(0.0, 0.0, body.wz)
     return JSONResponse({"ok": True})
 
 
+# ---------- Telemetría ----------
+
+@app.get("/api/telemetry")
+async def api_telemetry(
+    session: RobotSession = Depends(get_session),
+    topic: str | None = Query(None, description="Clave de RTC_TOPIC (LF_SPORT_MOD_STATE, LOW_STATE...)"),
+    field: str | None = Query(None, description="Campos separados por comas (position.x,rpy.yaw...)"),
+    seconds: float = Query(10.0, gt=0, description="Ventana hacia atrás desde la última muestra"),
+    points: int = Query(500, ge=0, le=10000, description="Máximo de puntos (0 = sin diezmar)"),
+):
+    """
+    Sin topic: topics suscritos, campos y contadores. Con topic: último valor de cada
+    campo. Con topic y field: ventana de 'seconds' diezmada a 'points' (media, min, max).
+    """
+    telemetry = session.client.telemetry
+    if topic is None:
+        return JSONResponse(telemetry.stats())
+    try:
+        ring = telemetry.ring(topic)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Sin telemetría de '{topic}'")
+    if field is None:
+        return JSONResponse({"topic": topic, **(ring.latest() or {})})
+    fields = [f.strip() for f in field.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in ring.index]
+    if unknown or not fields:
+        raise HTTPException(status_code=404, detail=f"Campos desconocidos en '{topic}': {', '.join(unknown)}")
+    return JSONResponse({"topic": topic, **ring.window(fields, seconds, points)})
+
+
 # ---------- Debug / Config ----------
 
 @app.get("/api/gamepad/state")
-async def api_gamepad_state():
-    return JSONResponse(manager.gamepad_state())
+async def api_gamepad_state(session: RobotSession = Depends(get_session)):
+    return JSONResponse(session.gamepad_state())
+
+
+@app.get("/api/gamepad/input")
+async def api_gamepad_input(session: RobotSession = Depends(get_session)):
+    """Estado del lector del mando (hilo, frecuencia, eventos descartados, edad del snapshot)."""
+    reader = session.teleop.reader
+    return JSONResponse(reader.stats() if reader is not None else {"gamepad": None})
 
 
 @app.post("/api/settings")
-async def api_update_settings(patch: Dict[str, Any] = Body(...)):
-    cfg = manager.update_settings(patch)
+async def api_update_settings(patch: Dict[str, Any] = Body(...), session: RobotSession = Depends(get_session)):
+    cfg = session.update_settings(patch)
     return JSONResponse({"ok": True, "settings": cfg})
 
 
 @app.post("/api/test/move")
-async def api_test_move(body: Dict[str, Any] = Body(...)):
+async def api_test_move(body: Dict[str, Any] = Body(...), session: RobotSession = Depends(get_session)):
     x = float(body.get("x", 0.0))
     y = float(body.get("y", 0.0))
     z = float(body.get("z", 0.0))
     duration_ms = int(body.get("duration_ms", 500))
-    await manager.client.send_move(x, y, z)
+    await session.client.send_move(x, y, z)
     await asyncio.sleep(max(0, duration_ms) / 1000.0)
-    await manager.client.estop_soft()
+    await session.client.estop_soft()
     return JSONResponse({"ok": True})
 
 
 # ---------- Vídeo ----------
 
+def _video_variant(session: RobotSession, w: int | None, q: int | None):
+    return parse_variant(w, q, session.settings.jpeg_quality)
+
+
+def _frame_etag(epoch: str, seq: int, variant) -> str:
+    if variant is None:
+        return f'"{epoch}-{seq}"'
+    return f'"{epoch}-{seq}-w{variant[0]}-q{variant[1]}"'
+
+
 @app.get("/api/video/frame")
-async def api_video_frame():
+async def api_video_frame(
+    request: Request,
+    w: int | None = Query(None, description="Ancho en px (mantiene aspecto)"),
+    q: int | None = Query(None, description="Calidad JPEG 10..100"),
+    after: int | None = Query(None, description="Long-poll: espera un frame con seq > after"),
+    wait_ms: int = Query(0, ge=0, le=30000, description="Espera máxima del long-poll"),
+    session: RobotSession = Depends(get_session),
+):
     """
-    Último frame como image/jpeg (204 si aún no hay frame)
+    Último frame como image/jpeg (204 si aún no hay frame).
+    - ETag = época del flujo + número de secuencia; If-None-Match igual => 304 sin cuerpo.
+    - ?after=<seq>&wait_ms=<ms>: espera hasta que exista un frame más nuevo; si no llega
+      en wait_ms, 204 sin cuerpo (304 queda sólo para If-None-Match). Un seq por delante del actual (reinicio del servidor) devuelve el frame actual.
     """
-    data = await manager.client.get_latest_jpeg()
+    client = session.client
+    variant = _video_variant(session, w, q)
+    was_active = client.video_active()
+    client.touch_video()
+    if after is not None:
+        frame = await client.next_frame(after, timeout=wait_ms / 1000.0)
+        if frame is None:
+            return Response(status_code=204, headers={"Cache-Control": "no-cache"})
+    elif was_active:
+        frame = client.latest_frame()
+    else:
+        # El pipeline estaba parado: espera al primer frame nuevo
+        latest = client.latest_frame()
+        frame = await client.next_frame(latest.seq if latest else 0, timeout=1.0) or client.latest_frame()
+    if frame is None:
+        return Response(status_code=204)
+
+    headers = {
+        "ETag": _frame_etag(client.video_epoch, frame.seq, variant),
+        "Cache-Control": "no-cache",
+        "X-Frame-Seq": str(frame.seq),
+        "X-Frame-Epoch": client.video_epoch,
+        "X-Frame-Timestamp": f"{frame.ts:.3f}",
+    }
+    inm = request.headers.get("if-none-match")
+    if inm and headers["ETag"] in [t.strip() for t in inm.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    data = await client.frame_jpeg(frame, variant)
     if not data:
         return Response(status_code=204)
-    return Response(content=data, media_type="image/jpeg")
+    return Response(content=data, media_type="image/jpeg", headers=headers)
 
 
 @app.get("/api/video/mjpeg")
-async def api_video_mjpeg():
+async def api_video_mjpeg(
+    w: int | None = Query(None, description="Ancho en px (mantiene aspecto)"),
+    q: int | None = Query(None, description="Calidad JPEG 10..100"),
+    session: RobotSession = Depends(get_session),
+):
+    """
+    Stream MJPEG (multipart/x-mixed-replace). ?w=320&q=50 pide una variante más ligera.
+    Cada parte multipart se construye una vez al publicar el frame y todos los visores
+    escriben el mismo buffer.
+    """
+    variant = _video_variant(session, w, q)
+
+    async def gen():
+        client = session.client
+        async with client.video_subscriber("mjpeg") as sub:
+            while True:
+                frame = await sub.get(timeout=2.0)
+                part = await client.frame_part(frame, variant)
+                if not part:
+                    # keep-alive para que el <img> no “muera”
+                    yield MJPEG_KEEPALIVE
+                    continue
+                yield part
+
+    return StreamingResponse(gen(), media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}")
+
+
+@app.post("/api/video/record/start")
+async def api_record_start(session: RobotSession = Depends(get_session)):
+    await session.recorder.start()
+    return JSONResponse({"ok": True, "recorder": session.recorder.status()})
+
+
+@app.post("/api/video/record/stop")
+async def api_record_stop(session: RobotSession = Depends(get_session)):
+    await session.recorder.stop()
+    return JSONResponse({"ok": True, "recorder": session.recorder.status()})
+
+
+@app.get("/api/video/record/status")
+async def api_record_status(session: RobotSession = Depends(get_session)):
+    return JSONResponse(session.recorder.status())
+
+
+@app.get("/api/video/recordings")
+async def api_recordings(session: RobotSession = Depends(get_session)):
+    """Segmentos grabados con su rango temporal (para elegir from/to)."""
+    segments = await asyncio.to_thread(list_recordings, session.recorder.directory)
+    return JSONResponse({"segments": segments})
+
+
+@app.get("/api/video/replay")
+async def api_video_replay(
+    t_from: float = Query(..., alias="from", description="Inicio (epoch s)"),
+    t_to: float | None = Query(None, alias="to", description="Fin (epoch s); por defecto hasta el final"),
+    speed: float = Query(1.0, ge=0.0, le=32.0, description="1 = tiempo real, 0 = lo más rápido posible"),
+    session: RobotSession = Depends(get_session),
+):
     """
-    Stream MJPEG (multipart/x-mixed-replace)
+    Reproduce lo grabado como MJPEG (mismo formato multipart que /api/video/mjpeg).
+    El seek usa el índice de cada segmento y los frames se leen por mmap.
     """
-    boundary = "frame"
+    end = t_to if t_to is not None else float("inf")
 
     async def gen():
+        async for _seq, _ts, jpeg in replay_frames(session.recorder.directory, t_from, end, speed):
+            yield mjpeg_part(jpeg)
+
+    return StreamingResponse(gen(), media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}")
+
+
+@app.websocket("/ws/video/replay")
+async def ws_video_replay(
+    ws: WebSocket,
+    t_from: float = Query(..., alias="from"),
+    t_to: float | None = Query(None, alias="to"),
+    speed: float = Query(1.0, ge=0.0, le=32.0),
+    session: RobotSession = Depends(get_session),
+):
+    """Reproducción por WebSocket con el mismo formato binario que /ws/video."""
+    await ws.accept()
+    end = t_to if t_to is not None else float("inf")
+    try:
+        async for seq, ts, jpeg in replay_frames(session.recorder.directory, t_from, end, speed):
+            await ws.send_bytes(ws_video_message(seq, ts, jpeg))
+        await ws.close()
+    except Exception:
+        pass
+
+
+@app.websocket("/ws/video")
+async def ws_video(
+    ws: WebSocket,
+    w: int | None = Query(None),
+    q: int | None = Query(None),
+    session: RobotSession = Depends(get_session),
+):
+    """
+    Vídeo por WebSocket: cada mensaje binario = cabecera WS_FRAME_HEADER
+    (versión, seq, timestamp de captura) + JPEG.
+    Backpressure: la suscripción tiene hueco para un solo frame; mientras send_bytes
+    está bloqueado porque el buffer del socket está lleno, los frames nuevos sustituyen
+    al pendiente y el cliente salta directamente al más reciente.
+    """
+    await ws.accept()
+    variant = _video_variant(session, w, q)
+    client = session.client
+
+    async def sender(sub):
         while True:
-            data = await manager.client.wait_for_frame(timeout=2.0)
-            if not data:
-                # keep-alive para que el <img> no “muera”
-                yield b"--" + boundary.encode() + b"\r\n\r\n"
+            frame = await sub.get(timeout=2.0)
+            if frame is None:
                 continue
-            yield (
-                b"--" + boundary.encode() + b"\r\n"
-                b"Content-Type: image/jpeg\r\n"
-                b"Content-Length: " + str(len(data)).encode() + b"\r\n\r\n" +
-                data + b"\r\n"
-            )
+            msg = await client.frame_ws_message(frame, variant)
+            if msg:
+                await ws.send_bytes(msg)
+
+    async with client.video_subscriber("ws", maxsize=1) as sub:
+        task = asyncio.create_task(sender(sub))
+        try:
+            while True:
+                msg = await ws.receive()
+                if msg["type"] == "websocket.disconnect":
+                    break
+        except Exception:
+            pass
+        finally:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            logger.debug(f"Cliente /ws/video desconectado ({sub.name}, saltados={sub.dropped}).")
+
+
+# ---------- WebSocket del mando ----------
+
+@app.websocket("/ws/gamepad")
+async def ws_gamepad(
+    ws: WebSocket,
+    gamepad: int | None = Query(None, ge=0, le=15, description="Índice SDL del mando"),
+    robot: str = Query(DEFAULT_ROBOT, description="Sin ?gamepad=, el mando asignado a este robot"),
+):
+    """
+    Estado del mando en frames JSON: un keyframe al conectar y después sólo deltas
+    (ejes que se mueven más de epsilon, botones y hats que cambian).
+    """
+    if gamepad is None:
+        session = manager.sessions.get(robot)
+        gamepad = session.gamepad if session is not None else None
+    sub = monitor.subscribe(gamepad) if gamepad is not None else None
+    if sub is None:
+        # Sin mando o sin lector para ese índice
+        await ws.close(code=1008)
+        return
+    await ws.accept()
 
-    return StreamingResponse(gen(), media_type=f"multipart/x-mixed-replace; boundary={boundary}")
+    async def sender():
+        while True:
+            await ws.send_text(await sub.get())
+
+    task = asyncio.create_task(sender())
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+    except Exception:
+        pass
+    finally:
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        monitor.unsubscribe(sub)
+        logger.debug(f"Cliente /ws/gamepad desconectado (mando {gamepad}, resyncs={sub.resyncs}).")
+
+
+@app.get("/api/gamepad/stream")
+async def api_gamepad_stream():
+    """Difusión de /ws/gamepad: clientes, frames, keyframes, bytes y resincronizaciones."""
+    return JSONResponse(monitor.stats())
 
 
 # ---------- WebSocket de logs ----------
 
 @app.websocket("/ws/logs")
-async def ws_logs(ws: WebSocket):
+async def ws_logs(
+    ws: WebSocket,
+    level: str | None = Query(None, description="Nivel mínimo (DEBUG, INFO, WARNING...)"),
+    topic: str | None = Query(None, description="Módulos separados por comas (teleop,go2_client...)"),
+    backfill: int = Query(LOG_BACKFILL_DEFAULT, ge=0, le=LOG_RING_SIZE, description="Registros previos a enviar al conectar"),
+):
+    """
+    Logs en vivo: mensajes {type: "logs", data: [{t, level, topic, msg}, ...]}.
+    El filtro se aplica en el servidor; al conectar llega primero el histórico reciente.
+    """
+    try:
+        filt = LogFilter(level, topic)
+    except ValueError:
+        await ws.close(code=1008)
+        return
     await ws.accept()
-    await add_ws(ws)
+    await add_ws(ws, filt, backfill)
     logger.info("Cliente WS conectado.")
     try:
         while True:
@@ -232,11 +659,11 @@ class CmdBody(BaseModel):
     cmd: str
 
 @app.post("/api/cmd")
-async def send_cmd(body: CmdBody):
+async def send_cmd(body: CmdBody, session: RobotSession = Depends(get_session)):
     """Execute a SPORT_CMD action manually from the web interface"""
     cmd_name = body.cmd
     try:
-        await manager.client.cmd(cmd_name)
+        await session.client.cmd(cmd_name)
         logger.info(f"Executed manual command: {cmd_name}")
         return {"ok": True, "cmd": cmd_name}
     except Exception as e:
@@ -246,10 +673,10 @@ class ModeBody(BaseModel):
     mode: str
 
 @app.post("/api/mode")
-async def set_mode(body: ModeBody):
+async def set_mode(body: ModeBody, session: RobotSession = Depends(get_session)):
     """Set robot movement mode: run / normal / stairs"""
     try:
-        await manager.client.set_mode(body.mode)
+        await session.client.set_mode(body.mode)
         logger.info(f"Robot mode changed to {body.mode}")
         return {"ok": True, "mode": body.mode}
     except Exception as e:
@@ -1,4 +1,4 @@
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 from pydantic import BaseModel
 import platform
 
@@ -30,6 +30,47 @@ class Settings(BaseModel):
     # Logs del mando
     log_gamepad: bool = True
 
+    # Lectura del mando: hilo propio (en macOS SDL exige el hilo principal -> en el loop)
+    gamepad_thread: bool = platform.system() != "Darwin"
+    gamepad_poll_hz: float = 250.0
+    gamepad_event_queue: int = 64   # flancos de botones pendientes antes de descartar
+
+    # Bucle de teleop (planificador por deadlines)
+    teleop_rate_hz: float = 33.0
+    teleop_max_catchup: int = 1     # ticks de retraso que se recuperan; más => se saltan
+    action_queue_size: int = 4      # acciones de botones en cola; la más vieja se descarta
+    teleop_profile: bool = False    # tiempos por etapa de cada tick (/api/teleop/profile)
+    teleop_profile_ticks: int = 2048
+    gamepad_monitor_hz: float = 30.0      # frames/s de /ws/gamepad (sólo si hay clientes)
+    gamepad_monitor_epsilon: float = 0.01 # cambio mínimo de un eje para enviarlo
+
+    # Supresión de Move repetidos (opt-in) + heartbeat para el timeout del robot
+    move_suppress: bool = False
+    move_epsilon: float = 0.01
+    move_heartbeat_s: float = 0.25
+
+    # Canal de comandos salientes
+    command_queue_size: int = 32            # SPORT_CMD discretos en cola antes de hacer esperar
+    command_response_timeout_s: float = 5.0 # espera máxima de la respuesta del robot
+
+    # Vídeo (codificación JPEG fuera del event loop)
+    video_encoder: str = "thread"   # thread | process
+    video_encoder_workers: int = 1
+    jpeg_quality: int = 95          # mismo valor por defecto que cv2.imencode
+    video_idle_grace_s: float = 5.0 # tras un GET /api/video/frame el vídeo sigue activo este tiempo
+    video_max_age_ms: int = 500     # frames más viejos se descartan en vez de servirse (0 = sin límite)
+    video_variant_cache: int = 32   # entradas LRU de variantes (?w=&q=) por (frame, ancho, calidad)
+
+    # Grabación de vídeo (segmentos append-only + índice)
+    record_dir: str = "recordings"
+    record_segment_mb: int = 64     # rotación de segmento
+    record_max_mb: int = 2048       # retención: tamaño total máximo en disco
+    record_queue: int = 64          # frames en cola antes de empezar a descartar
+
+    # Telemetría (claves de RTC_TOPIC; un ring buffer NumPy por topic)
+    telemetry_topics: List[str] = ["LF_SPORT_MOD_STATE", "LOW_STATE"]
+    telemetry_capacity: int = 6000  # muestras por topic (~5 min a 20 Hz)
+
     # -------- Mapeo dinámico de botones --------
     # Clave: índice del botón | Valor: comando SPORT_CMD
     button_actions: Dict[int, str] = (
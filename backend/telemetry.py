@@ -0,0 +1,259 @@
+# backend/telemetry.py
+import asyncio
+import time
+from functools import partial
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+from go2_webrtc_driver.constants import RTC_TOPIC
+
+# Campos por topic: nombre -> ruta dentro de message["data"] (claves e índices)
+_XYZ = ("x", "y", "z")
+SPORT_STATE_FIELDS = (
+    ("mode", ("mode",)),
+    ("gait_type", ("gait_type",)),
+    ("progress", ("progress",)),
+    ("body_height", ("body_height",)),
+    ("foot_raise_height", ("foot_raise_height",)),
+    *((f"position.{a}", ("position", i)) for i, a in enumerate(_XYZ)),
+    *((f"velocity.{a}", ("velocity", i)) for i, a in enumerate(_XYZ)),
+    ("yaw_speed", ("yaw_speed",)),
+    *((f"rpy.{a}", ("imu_state", "rpy", i)) for i, a in enumerate(("roll", "pitch", "yaw"))),
+    *((f"foot_force.{i}", ("foot_force", i)) for i in range(4)),
+)
+LOW_STATE_FIELDS = (
+    ("power_v", ("power_v",)),
+    ("power_a", ("power_a",)),
+    ("bms.soc", ("bms_state", "soc")),
+    ("bms.current", ("bms_state", "current")),
+    ("bms.cycle", ("bms_state", "cycle")),
+    ("temperature_ntc1", ("temperature_ntc1",)),
+    ("imu.temperature", ("imu_state", "temperature")),
+    *((f"foot_force.{i}", ("foot_force", i)) for i in range(4)),
+    *((f"motor.{i}.q", ("motor_state", i, "q")) for i in range(12)),
+    *((f"motor.{i}.temperature", ("motor_state", i, "temperature")) for i in range(12)),
+)
+TOPIC_FIELDS = {
+    "SPORT_MOD_STATE": SPORT_STATE_FIELDS,
+    "LF_SPORT_MOD_STATE": SPORT_STATE_FIELDS,
+    "LOW_STATE": LOW_STATE_FIELDS,
+}
+
+# Topics sin esquema: se toman las hojas numéricas del primer mensaje (hasta este límite)
+TELEMETRY_MAX_FIELDS = 256
+
+# El driver ignora subscribe() (sólo imprime un error) si el canal no está abierto:
+# los topics pendientes se reintentan con este intervalo hasta que abra
+TELEMETRY_RETRY_S = 0.5
+
+
+def _numeric_paths(data: Any, prefix: tuple = ()) -> list[tuple[str, tuple]]:
+    if isinstance(data, bool) or isinstance(data, (int, float)):
+        return [(".".join(str(p) for p in prefix), prefix)]
+    out = []
+    if isinstance(data, dict):
+        for k, v in data.items():
+            out.extend(_numeric_paths(v, prefix + (k,)))
+    elif isinstance(data, (list, tuple)):
+        for i, v in enumerate(data):
+            out.extend(_numeric_paths(v, prefix + (i,)))
+    return out
+
+
+def _json_values(arr: np.ndarray) -> list[Optional[float]]:
+    # JSON no admite NaN: una muestra sin el campo sale como null
+    return [None if v != v else v for v in arr.tolist()]
+
+
+def _lookup(data: Any, path: tuple) -> float:
+    for key in path:
+        data = data[key]
+    return float(data)
+
+
+class TelemetryRing:
+    """
+    Ring buffer de tamaño fijo orientado a columnas: una fila contigua de float64 por
+    campo más la de tiempos (time.time() de recepción). Todo se reserva al crearlo;
+    añadir una muestra es escribir una columna. Un campo ausente en el mensaje queda NaN.
+    """
+
+    def __init__(self, fields: Sequence[tuple[str, tuple]], capacity: int):
+        self.fields = tuple(name for name, _path in fields)
+        self.paths = tuple(path for _name, path in fields)
+        self.index = {name: i for i, name in enumerate(self.fields)}
+        self.capacity = max(1, int(capacity))
+        self._t = np.zeros(self.capacity, dtype=np.float64)
+        self._data = np.full((len(self.fields), self.capacity), np.nan, dtype=np.float64)
+        self._n = 0
+
+    def __len__(self) -> int:
+        return min(self._n, self.capacity)
+
+    def append(self, t: float, data: Any):
+        col = self._n % self.capacity
+        self._t[col] = t
+        out = self._data[:, col]
+        for i, path in enumerate(self.paths):
+            try:
+                out[i] = _lookup(data, path)
+            except (KeyError, IndexError, TypeError, ValueError):
+                out[i] = np.nan
+        self._n += 1
+
+    def _order(self) -> np.ndarray:
+        """Índices de columna del más viejo al más nuevo."""
+        count = len(self)
+        return np.arange(self._n - count, self._n) % self.capacity
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        if self._n == 0:
+            return None
+        col = (self._n - 1) % self.capacity
+        values = self._data[:, col].tolist()
+        return {
+            "t": float(self._t[col]),
+            "values": {f: (None if v != v else v) for f, v in zip(self.fields, values)},
+        }
+
+    def window(self, fields: Iterable[str], seconds: float, points: int) -> Dict[str, Any]:
+        """
+        Últimos 'seconds' de los campos pedidos. Con más muestras que 'points' se diezma
+        en 'points' tramos consecutivos: tiempo y valor medios más min/max de cada tramo.
+        Las muestras sin el campo (NaN) no cuentan en el tramo; un valor sin muestras es null.
+        """
+        rows = [self.index[f] for f in fields]   # KeyError si el campo no existe
+        order = self._order()
+        t = self._t[order]
+        if len(t):
+            order = order[np.searchsorted(t, t[-1] - seconds, side="left"):]
+            t = self._t[order]
+        data = self._data[rows][:, order]
+        n = len(t)
+        out: Dict[str, Any] = {"samples": n, "decimated": False}
+        if points > 0 and n > points:
+            starts = np.linspace(0, n, points + 1).astype(np.int64)[:-1]
+            counts = np.diff(np.append(starts, n))
+            t = np.add.reduceat(t, starts) / counts
+            out["decimated"] = True
+            # fmin/fmax ignoran NaN salvo que todo el tramo lo sea
+            out["min"] = {f: _json_values(np.fmin.reduceat(data[k], starts)) for k, f in enumerate(fields)}
+            out["max"] = {f: _json_values(np.fmax.reduceat(data[k], starts)) for k, f in enumerate(fields)}
+            valid = ~np.isnan(data)
+            sums = np.add.reduceat(np.where(valid, data, 0.0), starts, axis=1)
+            valid_counts = np.add.reduceat(valid, starts, axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                data = np.where(valid_counts > 0, sums / valid_counts, np.nan)
+        out["t"] = t.tolist()
+        out["values"] = {f: _json_values(data[k]) for k, f in enumerate(fields)}
+        return out
+
+
+class Telemetry:
+    """
+    Suscripción a los topics de estado del Go2 (Settings.telemetry_topics, claves de
+    RTC_TOPIC) por el pub_sub del datachannel. El driver llama al callback en el loop
+    con el mensaje ya parseado; aquí sólo se copian los campos numéricos a un
+    TelemetryRing por topic, sin guardar dicts. Los rings sobreviven a reconexiones.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.rings: Dict[str, TelemetryRing] = {}
+        self._topics: Dict[str, str] = {}   # clave RTC_TOPIC -> topic suscrito
+        self._pending: Dict[str, str] = {}  # esperando a que abra el datachannel
+        self._retry: Optional[asyncio.Task] = None
+
+        # Contadores por topic
+        self.received: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def attach(self, conn):
+        """Se suscribe a los topics configurados (tras conectar); si el canal aún no está abierto, reintenta."""
+        if self._retry is not None:   # reconexión sin detach previo
+            self._retry.cancel()
+            self._retry = None
+        self._topics.clear()
+        for key in self.settings.telemetry_topics:
+            topic = RTC_TOPIC.get(key)
+            if topic is None:
+                logger.warning(f"Telemetría: topic desconocido '{key}' (ver RTC_TOPIC).")
+                continue
+            self._pending[key] = topic
+        datachannel = conn.datachannel
+        if not self._subscribe_pending(datachannel):
+            logger.info("Telemetría: datachannel aún no abierto, se suscribirá al abrir.")
+            self._retry = asyncio.create_task(self._retry_loop(datachannel))
+
+    @staticmethod
+    def _channel_open(datachannel) -> bool:
+        channel = getattr(datachannel.pub_sub, "channel", None)
+        return getattr(channel, "readyState", None) == "open"
+
+    def _subscribe_pending(self, datachannel) -> bool:
+        """Suscribe lo pendiente si el canal está abierto. True si no queda nada pendiente."""
+        if not self._pending:
+            return True
+        if not self._channel_open(datachannel):
+            return False
+        for key, topic in self._pending.items():
+            datachannel.pub_sub.subscribe(topic, partial(self._on_message, key))
+            self._topics[key] = topic
+        logger.info(f"Telemetría suscrita a: {', '.join(self._pending)}")
+        self._pending.clear()
+        return True
+
+    async def _retry_loop(self, datachannel):
+        while not self._subscribe_pending(datachannel):
+            await asyncio.sleep(TELEMETRY_RETRY_S)
+
+    def detach(self, conn):
+        """Cancela las suscripciones (antes de cerrar la conexión)."""
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        self._pending.clear()
+        datachannel = getattr(conn, "datachannel", None)
+        for topic in self._topics.values():
+            if datachannel is None:
+                break
+            datachannel.pub_sub.subscriptions.pop(topic, None)
+            try:
+                datachannel.pub_sub.unsubscribe(topic)
+            except Exception as e:
+                logger.debug(f"Telemetría: error al desuscribir {topic}: {e}")
+        self._topics.clear()
+
+    def _on_message(self, key: str, message: Dict[str, Any]):
+        t = time.time()
+        data = message.get("data")
+        try:
+            ring = self.rings.get(key)
+            if ring is None:
+                fields = TOPIC_FIELDS.get(key) or _numeric_paths(data)[:TELEMETRY_MAX_FIELDS]
+                ring = self.rings[key] = TelemetryRing(fields, self.settings.telemetry_capacity)
+            ring.append(t, data)
+            self.received[key] = self.received.get(key, 0) + 1
+        except Exception as e:
+            self.errors[key] = self.errors.get(key, 0) + 1
+            logger.debug(f"Telemetría: mensaje de {key} no decodificado: {e}")
+
+    def ring(self, key: str) -> TelemetryRing:
+        return self.rings[key]   # KeyError si aún no ha llegado nada de ese topic
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            key: {
+                "subscribed": key in self._topics,
+                "fields": list(ring.fields),
+                "samples": len(ring),
+                "capacity": ring.capacity,
+                "received": self.received.get(key, 0),
+                "errors": self.errors.get(key, 0),
+            }
+            for key, ring in self.rings.items()
+        } | {
+            key: {"subscribed": key in self._topics, "samples": 0, "received": 0, "errors": self.errors.get(key, 0)}
+            for key in (*self._topics, *self._pending) if key not in self.rings
+        }
@@ -1,8 +1,14 @@
 import asyncio
-import pygame
-from time import monotonic
+from time import monotonic, perf_counter
 from loguru import logger
+from .actions import ActionWorker
+from .gamepad_input import EMPTY_SNAPSHOT, GamepadReader, GamepadSnapshot
+from .metrics import Histogram, MS_BUCKETS
+from .profiling import (
+    STAGE_AXES, STAGE_EVENTS, STAGE_LOG, STAGE_PUBLISH, STAGE_PUMP, STAGE_TRANSFORM, StageProfiler,
+)
 from .settings import Settings
+from .ticker import FixedRateTicker
 
 # Mapeo por defecto (igual que tu main.py):
 AX_LX_DEFAULT = 0  # izquierda/derecha (lateral -> y)
@@ -14,9 +20,10 @@ def apply_deadzone(v: float, dz: float) -> float:
 
 class XboxTeleop:
     """
-    Teleop Go2 con doble backend:
-      - SDL2 GameController (pygame._sdl2.controller.Controller) si está disponible
-      - Joystick clásico (pygame.joystick.Joystick) como fallback
+    Teleop Go2. La lectura del mando (SDL2 GameController o Joystick clásico) la hace
+    GamepadReader, en un hilo propio si Settings.gamepad_thread: el bucle de teleop sólo
+    consume snapshots inmutables y flancos de botones, nunca espera a SDL.
+    El lector lo asigna TeleopManager (binding mando -> robot); sin lector no arranca.
 
     Controles:
       y <- LX
@@ -27,9 +34,12 @@ class XboxTeleop:
       - btn_stand : StandUp
       - btn_sit   : Sit (o StandDown)
       - btn_stop  : StopMove
+
+    Las acciones de botones y cruceta no se esperan en el bucle: van a un ActionWorker
+    con cola acotada, así una acción lenta no retrasa los Move.
     """
 
-    def __init__(self, client, settings: Settings):
+    def __init__(self, client, settings: Settings, reader: GamepadReader | None = None):
         self.client = client
         self.settings = settings
 
@@ -37,34 +47,26 @@ class XboxTeleop:
         self._running = False
         self._last_dump = 0.0
 
-        # ---- Inicializa pygame ----
-        pygame.init()
-        pygame.joystick.init()
+        # Ritmo fijo por deadlines (Settings.teleop_rate_hz)
+        self.ticker = FixedRateTicker(self.settings.teleop_rate_hz, self.settings.teleop_max_catchup)
 
-        # ---- Backend 1: SDL2 GameController ----
-        self.gc = None
-        try:
-            from pygame._sdl2 import controller as sdl2c  # type: ignore
-            if sdl2c.get_count() > 0:
-                self.gc = sdl2c.Controller(0)
-                logger.success(f"🎮 [SDL2] Controlador: {self.gc.name}")
-        except Exception as e:
-            if self.settings.log_gamepad:
-                logger.debug(f"[SDL2] Controller no disponible: {e}")
+        # Latencia entrada -> publicación: lectura SDL (snapshot.t_read), fin de la
+        # transformación y salida del Move por el canal (perf_counter en los tres)
+        self.latency = {
+            "read_to_transform": Histogram(MS_BUCKETS),
+            "transform_to_publish": Histogram(MS_BUCKETS),
+            "read_to_publish": Histogram(MS_BUCKETS),
+        }
+        self.loop_errors = 0
 
-        # ---- Backend 2: Joystick clásico ----
-        self.js = None
-        if pygame.joystick.get_count() > 0:
-            self.js = pygame.joystick.Joystick(0)
-            self.js.init()
-            try:
-                name = self.js.get_name()
-            except Exception:
-                name = "Unknown Controller"
-            logger.success(f"🎮 [JOY ] Joystick: {name}")
-            logger.info(f"[JOY ] Axes={self.js.get_numaxes()} Buttons={self.js.get_numbuttons()} Hats={self.js.get_numhats()}")
-        elif not self.gc:
-            logger.warning("⚠️ No se ha detectado ningún mando en SDL2 ni Joystick.")
+        # Perfil por etapas de cada tick (Settings.teleop_profile; coste ~nulo apagado)
+        self.profiler = StageProfiler(capacity=self.settings.teleop_profile_ticks)
+
+        # ---- Lector del mando (SDL fuera del event loop); None = sin mando asignado ----
+        self.reader = reader
+
+        # ---- Acciones de botones fuera del bucle ----
+        self.actions = ActionWorker(client, settings)
 
         # Ejes (forzables desde settings)
         self.ax_lx = AX_LX_DEFAULT if self.settings.ls_x_axis is None else int(self.settings.ls_x_axis)
@@ -78,73 +80,40 @@ class XboxTeleop:
     # ---------- Utilidades de estado ----------
 
     def connected(self) -> bool:
-        return bool(self.gc) or bool(self.js)
+        return self.reader is not None and self.reader.connected()
+
+    def snapshot(self) -> GamepadSnapshot:
+        return self.reader.snapshot() if self.reader is not None else EMPTY_SNAPSHOT
 
     def num_axes(self) -> int:
-        if self.gc:
-            return 6  # mapeo típico
-        if self.js:
-            return self.js.get_numaxes()
-        return 0
+        return len(self.snapshot().axes)
 
     def num_buttons(self) -> int:
-        if self.gc:
-            return 16  # mapeo típico Xbox
-        if self.js:
-            return self.js.get_numbuttons()
-        return 0
-
-    def _axis_raw_gc(self, idx: int) -> float:
-        """
-        SDL2 GameController mapea por nombre:
-          0: leftx, 1: lefty, 2: rightx, 3:righty, 4:lefttrigger, 5:righttrigger
-        """
-        try:
-            v = 0.0
-            if idx == 0:
-                v = float(self.gc.get_axis(0))  # leftx
-            elif idx == 1:
-                v = float(self.gc.get_axis(1))  # lefty
-            elif idx == 2:
-                v = float(self.gc.get_axis(2))  # rightx
-            elif idx == 3:
-                v = float(self.gc.get_axis(3))  # righty
-            elif idx == 4:
-                v = float(self.gc.get_axis(4))  # lefttrigger
-            elif idx == 5:
-                v = float(self.gc.get_axis(5))  # righttrigger
-            return v
-        except Exception:
-            return 0.0
+        return len(self.snapshot().buttons)
 
     def axis_raw(self, i: int) -> float:
-        if self.gc:
-            return self._axis_raw_gc(i)
-        if self.js and 0 <= i < self.js.get_numaxes():
-            return float(self.js.get_axis(i))
-        return 0.0
+        return self.snapshot().axis(i)
 
     def button_state(self, i: int) -> bool:
-        if self.gc:
-            try:
-                return bool(self.gc.get_button(i))
-            except Exception:
-                return False
-        if self.js and 0 <= i < self.js.get_numbuttons():
-            return bool(self.js.get_button(i))
-        return False
+        return self.snapshot().button(i)
 
     # ---------- Teleop ----------
 
     def is_running(self) -> bool:
         return self._running
 
-    async def start(self):
+    async def start(self, phase: float | None = None):
         if self._running:
             return
+        if self.reader is None:
+            logger.warning("Teleop sin mando asignado: no se inicia.")
+            return
         self._running = True
+        self.reader.start(asyncio.get_running_loop())
+        self.ticker.reset(phase)
+        self.actions.start()
         self._task = asyncio.create_task(self._loop())
-        logger.info("Teleoperación iniciada.")
+        logger.info(f"Teleoperación iniciada ({self.ticker.rate_hz:g} Hz).")
 
     async def stop(self):
         if not self._running:
@@ -157,6 +126,7 @@ class XboxTeleop:
             except asyncio.CancelledError:
                 pass
             self._task = None
+        await self.actions.stop()
         try:
             await self.client.estop_soft()
         except Exception:
@@ -167,29 +137,36 @@ class XboxTeleop:
         # Pausa breve para datachannel
         await asyncio.sleep(0.12)
 
+        prof = self.profiler
+        reader = self.reader
         while self._running:
+            prof.enabled = self.settings.teleop_profile
+            prof.begin()
             try:
-                # Pump de eventos siempre (importante en macOS)
-                pygame.event.pump()
+                # Snapshot del mando (hilo lector) o pump+lectura aquí si no hay hilo
+                snap = reader.snapshot()
+                prof.mark(STAGE_PUMP)
 
-                # Lee eventos de botones (por si el backend joystick emite)
-                for event in pygame.event.get():
-                    if event.type == pygame.JOYBUTTONDOWN:
+                # Flancos de botones / cruceta (por si el backend joystick emite)
+                for ev in reader.drain_events():
+                    if ev.kind == "button_down":
                         if self.settings.log_gamepad:
-                            logger.debug(f"[BTN DOWN] {event.button}")
-                        await self._handle_button_down(event.button)
-                    elif event.type == pygame.JOYBUTTONUP:
+                            logger.debug(f"[BTN DOWN] {ev.index}")
+                        self._handle_button_down(ev.index)
+                    elif ev.kind == "button_up":
                         if self.settings.log_gamepad:
-                            logger.debug(f"[BTN UP] {event.button}")
-                    elif event.type == pygame.JOYHATMOTION:
+                            logger.debug(f"[BTN UP] {ev.index}")
+                    elif ev.kind == "hat":
                         if self.settings.log_gamepad:
-                            logger.debug(f"[HAT MOTION] {event.hat} -> {event.value}")
-                            await self._handle_hat_motion(event.value)
+                            logger.debug(f"[HAT MOTION] {ev.index} -> {ev.value}")
+                        self._handle_hat_motion(ev.value)
+                prof.mark(STAGE_EVENTS)
 
                 # Lee ejes crudos
-                lx = self.axis_raw(self.ax_lx)
-                ly = self.axis_raw(self.ax_ly)
-                rx = self.axis_raw(self.ax_rx)
+                lx = snap.axis(self.ax_lx)
+                ly = snap.axis(self.ax_ly)
+                rx = snap.axis(self.ax_rx)
+                prof.mark(STAGE_AXES)
 
                 # Dump periódico y on-change (sólo si está activado)
                 if self.settings.log_gamepad:
@@ -207,6 +184,7 @@ class XboxTeleop:
                     log_change(f"a{self.ax_lx}", lx)
                     log_change(f"a{self.ax_ly}", ly)
                     log_change(f"a{self.ax_rx}", rx)
+                    prof.mark(STAGE_LOG)
 
                 # Deadzone y escalado (igual que tu script)
                 dz = float(self.settings.deadzone)
@@ -220,15 +198,44 @@ class XboxTeleop:
                 if self.settings.invert_z: z = -z
 
                 # Enviar al robot
-                await self.client.send_move(x, y, z)
+                t_transform = perf_counter()
+                prof.mark(STAGE_TRANSFORM)
+                t_sent = await self.client.send_move(x, y, z)
+                prof.mark(STAGE_PUBLISH)
+                self._observe_latency(snap.t_read, t_transform, t_sent)
 
             except Exception as e:
+                self.loop_errors += 1
                 logger.warning(f"Teleop loop error: {e}")
-
-            await asyncio.sleep(0.03)  # ~33 Hz
+            prof.end()
+
+            # Ritmo configurable; si cambió en caliente se re-ancla el ticker
+            if self.ticker.rate_hz != self.settings.teleop_rate_hz:
+                self.ticker.set_rate(self.settings.teleop_rate_hz)
+            self.ticker.max_catchup = self.settings.teleop_max_catchup
+            await self.ticker.wait()
+
+    def _observe_latency(self, t_read: float, t_transform: float, t_sent: float | None):
+        if not t_read:
+            return   # aún no hay lectura del mando
+        lat = self.latency
+        lat["read_to_transform"].observe((t_transform - t_read) * 1000.0)
+        # None: Move suprimido, sustituido por un StopMove o sin scheduler
+        if t_sent is not None:
+            lat["transform_to_publish"].observe((t_sent - t_transform) * 1000.0)
+            lat["read_to_publish"].observe((t_sent - t_read) * 1000.0)
+
+    def timing_stats(self) -> dict:
+        stats = self.ticker.stats()
+        stats["loop_errors"] = self.loop_errors
+        stats["latency_ms"] = {k: h.snapshot() for k, h in self.latency.items()}
+        return stats
+
+    def action_stats(self) -> dict:
+        return self.actions.stats()
 
     # ---------- Acciones de botones (configurables) ----------
-    async def _handle_button_down(self, btn: int):
+    def _handle_button_down(self, btn: int):
         """
         Ejecuta la acción configurada en Settings.button_actions.
         Ejemplo:
@@ -244,13 +251,13 @@ class XboxTeleop:
             if self.settings.log_gamepad:
                 logger.info(f"🎮 Botón {btn} → Ejecutando comando: {cmd_name}")
 
-            # Llama a la API del cliente con el comando dinámico
-            await self.client.cmd(cmd_name)
+            # Encola el comando dinámico; lo ejecuta el ActionWorker
+            self.actions.submit(cmd_name, f"btn{btn}")
 
         except Exception as e:
             logger.warning(f"Acción de botón falló (btn={btn}): {e}")
             
-    async def _handle_hat_motion(self, hat_value):
+    def _handle_hat_motion(self, hat_value):
         """
         Ejecuta una acción según el valor del D-Pad (cruceta).
         Ejemplo: (0, -1) -> Sit
@@ -265,7 +272,7 @@ class XboxTeleop:
             if self.settings.log_gamepad:
                 logger.info(f"🎮 D-Pad {hat_value} → Ejecutando comando: {cmd_name}")
 
-            await self.client.cmd(cmd_name)
+            self.actions.submit(cmd_name, f"hat{hat_value}")
 
         except Exception as e:
             logger.warning(f"Acción de cruceta falló ({hat_value}): {e}")
@@ -0,0 +1,93 @@
+# backend/ticker.py
+import asyncio
+from typing import Any, Dict, Optional
+
+from .metrics import Histogram, MS_BUCKETS
+
+
+class FixedRateTicker:
+    """
+    Planificador por deadlines para bucles periódicos (teleop).
+
+    El tick k vence en t0 + k * period, así el trabajo de cada iteración no desplaza
+    a las siguientes (con un sleep fijo el ritmo real siempre queda por debajo).
+    Si un tick llega tarde:
+      - hasta 'max_catchup' periodos de retraso: se ejecuta en el acto (catch-up);
+      - más retraso: se saltan explícitamente los ticks perdidos (skipped).
+    Todo tick cuyo trabajo termina después del deadline siguiente cuenta como overrun,
+    se recupere o no.
+    El retraso de cada tick sobre su deadline (jitter) va a un histograma en ms.
+    """
+
+    def __init__(self, rate_hz: float, max_catchup: int = 1):
+        self.set_rate(rate_hz)
+        self.max_catchup = max(0, int(max_catchup))
+        self._next: Optional[float] = None
+        self._last_tick: Optional[float] = None
+        self.phase = 0.0   # fracción de periodo de desfase del primer tick
+
+        self.jitter_ms = Histogram(MS_BUCKETS)
+        self.period_ms = Histogram(MS_BUCKETS + (500, 1000))
+        self.ticks = 0
+        self.catchups = 0
+        self.skipped = 0
+        self.overruns = 0
+
+    def set_rate(self, rate_hz: float):
+        self.rate_hz = max(0.1, float(rate_hz))
+        self.period = 1.0 / self.rate_hz
+        self._next = None   # re-ancla en el siguiente wait()
+
+    def reset(self, phase: Optional[float] = None):
+        """
+        Re-ancla en el siguiente wait(). 'phase' (0..1) retrasa el primer tick esa fracción
+        de periodo: varios bucles al mismo ritmo quedan intercalados en vez de coincidir.
+        """
+        if phase is not None:
+            self.phase = float(phase) % 1.0
+        self._next = None
+        self._last_tick = None
+
+    async def wait(self) -> int:
+        """Duerme hasta el siguiente deadline. Devuelve cuántos ticks se han saltado."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._next is None:
+            self._next = now + self.phase * self.period
+        else:
+            self._next += self.period
+
+        skipped = 0
+        if now < self._next:
+            await asyncio.sleep(self._next - now)
+        else:
+            if now > self._next:
+                self.overruns += 1
+            behind = int((now - self._next) // self.period)
+            if behind > self.max_catchup:
+                skipped = behind
+                self._next += behind * self.period
+                self.skipped += behind
+            elif now > self._next:
+                self.catchups += 1
+
+        t = loop.time()
+        self.jitter_ms.observe(max(0.0, t - self._next) * 1000.0)
+        if self._last_tick is not None:
+            self.period_ms.observe((t - self._last_tick) * 1000.0)
+        self._last_tick = t
+        self.ticks += 1
+        return skipped
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_hz": self.rate_hz,
+            "period_ms": self.period * 1000.0,
+            "max_catchup": self.max_catchup,
+            "ticks": self.ticks,
+            "catchups": self.catchups,
+            "skipped": self.skipped,
+            "overruns": self.overruns,
+            "jitter_ms": self.jitter_ms.snapshot(),
+            "measured_period_ms": self.period_ms.snapshot(),
+        }
@@ -0,0 +1,416 @@
+# backend/video.py
+import asyncio
+import struct
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import count
+from time import monotonic
+from typing import Any, Awaitable, Callable, Optional
+
+import cv2
+import numpy as np
+from loguru import logger
+
+
+# ---------- MJPEG (multipart/x-mixed-replace) ----------
+
+MJPEG_BOUNDARY = "frame"
+MJPEG_KEEPALIVE = b"--" + MJPEG_BOUNDARY.encode() + b"\r\n\r\n"
+
+
+def mjpeg_part(jpeg: bytes) -> bytes:
+    """Parte multipart completa (boundary + cabeceras + JPEG). Se construye una vez por frame."""
+    return b"".join((
+        b"--", MJPEG_BOUNDARY.encode(), b"\r\n"
+        b"Content-Type: image/jpeg\r\n"
+        b"Content-Length: ", str(len(jpeg)).encode(), b"\r\n\r\n",
+        jpeg, b"\r\n",
+    ))
+
+
+# ---------- WebSocket /ws/video ----------
+
+# Cabecera binaria de cada mensaje: versión (u8), seq (u64), captura time.time() (f64), big-endian
+WS_FRAME_HEADER = struct.Struct("!BQd")
+WS_FRAME_VERSION = 1
+
+
+def ws_video_message(seq: int, ts: float, jpeg: bytes) -> bytes:
+    return b"".join((WS_FRAME_HEADER.pack(WS_FRAME_VERSION, seq, ts), jpeg))
+
+
+def encode_bgr(img: np.ndarray, quality: int) -> Optional[bytes]:
+    """JPEG de una imagen BGR. Función de módulo para poder usarla en un ProcessPool."""
+    ok, enc = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        return None
+    return enc.tobytes()
+
+
+def frame_to_bgr(frame: Any) -> np.ndarray:
+    """aiortc VideoFrame -> numpy BGR (como en el ejemplo del driver)."""
+    return frame.to_ndarray(format="bgr24")
+
+
+def frame_to_jpeg(frame: Any, quality: int) -> tuple[np.ndarray, Optional[bytes]]:
+    """Devuelve también la imagen BGR: es la fuente de las variantes (VariantCache)."""
+    img = frame_to_bgr(frame)
+    return img, encode_bgr(img, quality)
+
+
+def encode_variant(img: np.ndarray, width: Optional[int], quality: int) -> Optional[bytes]:
+    """Redimensiona (manteniendo aspecto) a 'width' px de ancho y codifica con 'quality'."""
+    h, w = img.shape[:2]
+    if width and width < w:
+        height = max(1, round(h * width / w))
+        img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+    return encode_bgr(img, quality)
+
+
+def parse_variant(w: Optional[int], q: Optional[int], default_quality: int) -> Optional[tuple[int, int]]:
+    """
+    Normaliza los query params ?w=&q= a una clave (ancho, calidad).
+    None => frame por defecto (resolución completa, calidad de Settings).
+    """
+    width = 0 if not w else min(max(int(w), 16), 4096)
+    quality = int(default_quality) if q is None else min(max(int(q), 10), 100)
+    if width == 0 and quality == int(default_quality):
+        return None
+    return width, quality
+
+
+@dataclass(frozen=True, eq=False)
+class EncodedFrame:
+    """
+    Frame publicado: número de secuencia monótono + JPEG.
+    'part' es la parte MJPEG ya construida: inmutable y compartida por todos los visores.
+    La fuente BGR para variantes no viaja con el frame (ver FrameHub.latest_img).
+    """
+    seq: int
+    t_recv: float          # monotonic() al recibirlo del track
+    ts: float              # time.time() al recibirlo (marca de captura para clientes)
+    jpeg: bytes
+    part: bytes
+
+    @cached_property
+    def ws_message(self) -> bytes:
+        """Mensaje binario para /ws/video; se construye la primera vez que se pide y se comparte."""
+        return ws_video_message(self.seq, self.ts, self.jpeg)
+
+    @classmethod
+    def build(cls, seq: int, t_recv: float, ts: float, jpeg: bytes) -> "EncodedFrame":
+        return cls(seq=seq, t_recv=t_recv, ts=ts, jpeg=jpeg, part=mjpeg_part(jpeg))
+
+
+class FrameSubscription:
+    """Cola acotada de un suscriptor. Si se llena, se tira el frame más viejo (sólo para él)."""
+
+    def __init__(self, hub: "FrameHub", name: str, maxsize: int):
+        self.hub = hub
+        self.name = name
+        self.queue: asyncio.Queue[EncodedFrame] = asyncio.Queue(maxsize=max(1, int(maxsize)))
+        self.delivered = 0
+        self.dropped = 0
+        self.last_seq = 0
+
+    def _offer(self, frame: EncodedFrame):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[EncodedFrame]:
+        """Siguiente frame (seq siempre creciente), o None si vence el timeout."""
+        try:
+            if timeout is None:
+                frame = await self.queue.get()
+            else:
+                frame = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.delivered += 1
+        self.last_seq = frame.seq
+        return frame
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+            "last_seq": self.last_seq,
+        }
+
+
+class FrameHub:
+    """
+    Difusión de frames a N suscriptores sin locks ni Event compartido.
+    Cada frame lleva un seq monótono; cada suscriptor tiene su propia cola acotada,
+    así un visor lento pierde frames sin afectar a los rápidos.
+
+    Sólo se retiene la imagen BGR (~2.7 MB a 720p) del último frame, para codificar
+    variantes; las colas guardan únicamente el JPEG, así un suscriptor atrasado (el
+    grabador con record_queue frames) no fija decenas de imágenes en memoria.
+    """
+
+    def __init__(self):
+        self.latest: Optional[EncodedFrame] = None
+        self.latest_img: Optional[np.ndarray] = None
+        self._subs: list[FrameSubscription] = []
+        self._ids = count(1)
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+    def publish(self, frame: EncodedFrame, img: Optional[np.ndarray] = None):
+        self.latest = frame
+        self.latest_img = img
+        for sub in self._subs:
+            sub._offer(frame)
+
+    def subscribe(self, name: str = "sub", maxsize: int = 2) -> FrameSubscription:
+        sub = FrameSubscription(self, f"{name}#{next(self._ids)}", maxsize)
+        self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: FrameSubscription):
+        try:
+            self._subs.remove(sub)
+        except ValueError:
+            pass
+
+    def source_img(self, frame: EncodedFrame) -> Optional[np.ndarray]:
+        """Imagen BGR del frame si sigue siendo el último publicado; si no, None."""
+        return self.latest_img if frame is self.latest else None
+
+    def reset(self):
+        self.latest = None
+        self.latest_img = None
+
+    def stats(self) -> dict:
+        return {
+            "latest_seq": self.latest.seq if self.latest else 0,
+            "subscribers": [sub.stats() for sub in self._subs],
+        }
+
+
+class JpegEncoder:
+    """
+    Etapa de codificación JPEG fuera del event loop.
+
+    - mode="thread":  conversión BGR + imencode en un ThreadPoolExecutor
+                      (OpenCV y PyAV liberan el GIL mientras trabajan).
+    - mode="process": conversión BGR en un hilo e imencode en un ProcessPoolExecutor.
+
+    Semántica latest-frame-wins: hay un único hueco de frame pendiente. Si llega un
+    frame nuevo mientras los workers están ocupados, sustituye al pendiente (que se
+    cuenta como descartado), así una codificación lenta nunca acumula frames viejos.
+    Con max_age > 0, un frame que lleva más de max_age segundos recibido cuando un
+    worker lo recoge se descarta sin codificar.
+    """
+
+    def __init__(
+        self,
+        on_encoded: Callable[[bytes, float, np.ndarray], Awaitable[None]],
+        mode: str = "thread",
+        workers: int = 1,
+        quality: int = 95,
+        max_age: float = 0.0,
+    ):
+        self.on_encoded = on_encoded
+        self.mode = (mode or "thread").strip().lower()
+        self.workers = max(1, int(workers))
+        self.quality = int(quality)
+        self.max_age = float(max_age)
+
+        self._pool: Optional[Executor] = None
+        self._convert_pool: Optional[ThreadPoolExecutor] = None
+        self._tasks: list[asyncio.Task] = []
+        self._pending: Any = None
+        self._pending_id = 0
+        self._published_id = 0
+        self._wake: Optional[asyncio.Event] = None
+
+        # Contadores
+        self.submitted = 0
+        self.encoded = 0
+        self.dropped = 0
+        self.expired = 0
+        self.failed = 0
+
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self._tasks:
+            return
+        if self.mode == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._convert_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="go2-bgr")
+        else:
+            self.mode = "thread"
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="go2-jpeg")
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"JpegEncoder iniciado (mode={self.mode}, workers={self.workers}, q={self.quality})")
+
+    def submit(self, frame: Any, t_recv: Optional[float] = None):
+        """Deja el frame en el hueco pendiente (no bloquea nunca). t_recv en monotonic()."""
+        if not self._tasks:
+            return
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending_id += 1
+        self._pending = (self._pending_id, frame, monotonic() if t_recv is None else t_recv)
+        self.submitted += 1
+        self._wake.set()
+
+    async def _encode(self, frame: Any) -> tuple[np.ndarray, Optional[bytes]]:
+        loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            img = await loop.run_in_executor(self._convert_pool, frame_to_bgr, frame)
+            return img, await loop.run_in_executor(self._pool, encode_bgr, img, self.quality)
+        return await loop.run_in_executor(self._pool, frame_to_jpeg, frame, self.quality)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta un trabajo de codificación arbitrario en el mismo pool."""
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    async def _worker(self):
+        while True:
+            await self._wake.wait()
+            job = self._pending
+            self._pending = None
+            self._wake.clear()
+            if job is None:
+                continue
+            job_id, frame, t_recv = job
+            if self.max_age > 0 and monotonic() - t_recv > self.max_age:
+                self.expired += 1
+                continue
+            try:
+                img, data = await self._encode(frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Fallo codificando JPEG: {e}")
+                continue
+            if not data:
+                self.failed += 1
+                continue
+            # Con varios workers un frame antiguo puede terminar después de uno nuevo
+            if job_id <= self._published_id:
+                self.dropped += 1
+                continue
+            self._published_id = job_id
+            self.encoded += 1
+            await self.on_encoded(data, t_recv, img)
+
+    async def close(self):
+        for t in self._tasks:
+            t.cancel()
+        for t in self._tasks:
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._pending = None
+        for pool in (self._pool, self._convert_pool):
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self._convert_pool = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "quality": self.quality,
+            "submitted": self.submitted,
+            "encoded": self.encoded,
+            "dropped": self.dropped,
+            "expired": self.expired,
+            "failed": self.failed,
+        }
+
+
+class VariantCache:
+    """
+    Cache LRU de variantes JPEG (ancho/calidad) indexada por número de secuencia del frame.
+
+    Cada variante se codifica como mucho una vez por frame fuente: las peticiones
+    concurrentes de la misma (seq, ancho, calidad) esperan el mismo future, y el
+    resultado (JPEG + parte MJPEG) se comparte entre todos los clientes que la piden.
+    """
+
+    def __init__(self, encoder: JpegEncoder, capacity: int = 32):
+        self.encoder = encoder
+        self.capacity = max(1, int(capacity))
+        self._entries: "OrderedDict[tuple[int, int, int], asyncio.Future]" = OrderedDict()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.unavailable = 0
+
+    async def _encode(self, img: np.ndarray, width: int, quality: int) -> Optional[tuple[bytes, bytes]]:
+        jpeg = await self.encoder.run(encode_variant, img, width, quality)
+        if not jpeg:
+            return None
+        return jpeg, mjpeg_part(jpeg)
+
+    async def get_entry(self, seq: int, img: Optional[np.ndarray], variant: tuple[int, int]) -> Optional[tuple[bytes, bytes]]:
+        """
+        (jpeg, parte MJPEG) de la variante para el frame 'seq'. img=None (la fuente ya no
+        se retiene) sólo sirve si la variante ya estaba en cache.
+        """
+        width, quality = variant
+        key = (seq, width, quality)
+        fut = self._entries.get(key)
+        if fut is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        elif img is None:
+            self.unavailable += 1
+            return None
+        else:
+            self.misses += 1
+            fut = asyncio.ensure_future(self._encode(img, width, quality))
+            self._entries[key] = fut
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        try:
+            # shield: si un cliente se va, la codificación sigue para los demás
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._entries.pop(key, None)
+            logger.warning(f"Fallo codificando variante {variant}: {e}")
+            return None
+
+    async def get(self, seq: int, img: Optional[np.ndarray], variant: tuple[int, int]) -> Optional[bytes]:
+        entry = await self.get_entry(seq, img, variant)
+        return entry[0] if entry else None
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "unavailable": self.unavailable,
+        }
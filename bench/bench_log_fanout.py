@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Stress test del reparto de logs a /ws/logs con un cliente parado.
+
+N clientes de pega (send_text con la latencia de un socket local) y uno que deja de
+leer: su send_text no vuelve nunca, como un navegador con la pestaña congelada y el
+buffer TCP lleno. Se mide cuánto tardan los clientes sanos en recibir M lotes.
+
+  - old: _broadcast secuencial de antes (await ws.send_text cliente a cliente);
+         se corta a los --deadline segundos porque con el cliente parado no acaba.
+  - new: backend.logger (buffer acotado y writer por cliente, timeout de envío).
+
+Uso:
+    python bench/bench_log_fanout.py [--clients 50] [--batches 200]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import logger as logmod  # noqa: E402
+
+
+class FakeWS:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.received = 0
+        self.done = asyncio.Event()
+        self.target = 0
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        if self.received >= self.target:
+            self.done.set()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class StalledWS(FakeWS):
+    async def send_text(self, text: str):
+        await asyncio.Event().wait()
+
+
+def batch(i: int) -> list[str]:
+    return [f"2025-01-01 00:00:00 | DEBUG | [axis Δ] a0: +0.{i % 10}0 → +0.{(i + 1) % 10}0"] * 20
+
+
+def records(i: int) -> list[logmod.LogRecord]:
+    # Lo que el drainer pasa a _broadcast: registros estructurados (JSON hecho una vez)
+    msg = f"[axis Δ] a0: +0.{i % 10}0 → +0.{(i + 1) % 10}0"
+    return [logmod.LogRecord(1735689600.0, "DEBUG", 10, "teleop", msg, msg)] * 20
+
+
+async def run_old(healthy: list[FakeWS], stalled: list[FakeWS], batches: int, deadline: float) -> float:
+    clients = set(healthy) | set(stalled)
+
+    async def legacy_broadcast(text):
+        for ws in list(clients):
+            try:
+                await ws.send_text(text)
+            except Exception:
+                clients.discard(ws)
+
+    async def produce():
+        for i in range(batches):
+            await legacy_broadcast(json.dumps({"type": "logs", "data": batch(i)}))
+
+    t0 = time.perf_counter()
+    try:
+        await asyncio.wait_for(produce(), deadline)
+    except asyncio.TimeoutError:
+        pass
+    return time.perf_counter() - t0
+
+
+async def run_new(healthy: list[FakeWS], stalled: list[FakeWS], batches: int, deadline: float) -> float:
+    for ws in healthy + stalled:
+        await logmod.add_ws(ws)
+    t0 = time.perf_counter()
+    for i in range(batches):
+        logmod._broadcast(records(i))
+        await asyncio.sleep(0)
+    try:
+        await asyncio.wait_for(asyncio.gather(*(ws.done.wait() for ws in healthy)), deadline)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - t0
+    # El parado no bloquea a nadie; se espera a que lo expulse el timeout de envío
+    while any(ws in logmod._ws_clients for ws in stalled) and time.perf_counter() - t0 < deadline:
+        await asyncio.sleep(0.01)
+    if stalled:
+        print(f"    cliente parado expulsado a los {(time.perf_counter() - t0) * 1000:.0f} ms")
+    for ws in healthy + stalled:
+        await logmod.remove_ws(ws)
+    return elapsed
+
+
+async def scenario(name, runner, n_clients, n_stalled, batches, latency, deadline):
+    healthy = [FakeWS(latency) for _ in range(n_clients - n_stalled)]
+    stalled = [StalledWS(latency) for _ in range(n_stalled)]
+    for ws in healthy:
+        ws.target = batches
+    elapsed = await runner(healthy, stalled, batches, deadline)
+    delivered = sum(ws.received for ws in healthy)
+    rate = delivered / elapsed if elapsed > 0 else 0.0
+    complete = sum(ws.received >= batches for ws in healthy)
+    print(f"{name:<34} {elapsed * 1000:9.1f} ms  {rate:10.0f} msg/s  "
+          f"completos {complete}/{len(healthy)}")
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--batches", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="latencia de send_text de un cliente sano (0 = una vuelta del loop)")
+    ap.add_argument("--deadline", type=float, default=10.0)
+    ap.add_argument("--send-timeout", type=float, default=0.5, help="LOG_SEND_TIMEOUT para la prueba")
+    args = ap.parse_args()
+
+    logmod.LOG_CLIENT_BUFFER = max(logmod.LOG_CLIENT_BUFFER, args.batches)   # sin descartes: se mide el reparto
+    logmod.LOG_SEND_TIMEOUT = args.send_timeout
+    lat = args.latency_ms / 1000.0
+    print(f"{args.clients} clientes, {args.batches} lotes, latencia {args.latency_ms} ms\n")
+    for name, runner in (("old", run_old), ("new", run_new)):
+        await scenario(f"{name}: todos leyendo", runner, args.clients, 0, args.batches, lat, args.deadline)
+        await scenario(f"{name}: 1 cliente parado", runner, args.clients, 1, args.batches, lat, args.deadline)
+    print(f"\nnew: clientes expulsados = {logmod.log_stats()['evicted']} (LOG_SEND_TIMEOUT={logmod.LOG_SEND_TIMEOUT}s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark del stream MJPEG: coste por visor añadido con 10, 50 y 100 clientes.
+
+Compara el generador antiguo (concatena boundary + cabeceras + JPEG por visor y
+por frame) con el nuevo (parte multipart construida una vez al publicar).
+Cada visor es una task con su suscripción al FrameHub; el "socket" retiene el
+último chunk enviado, como haría el buffer de escritura de uvicorn.
+
+Uso:
+    python bench/bench_mjpeg.py [--frames 200] [--jpeg-kb 120]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.video import MJPEG_BOUNDARY, EncodedFrame, FrameHub  # noqa: E402
+
+
+def old_chunk(data: bytes) -> bytes:
+    # Copia literal del gen() original de api_video_mjpeg
+    boundary = MJPEG_BOUNDARY
+    return (
+        b"--" + boundary.encode() + b"\r\n"
+        b"Content-Type: image/jpeg\r\n"
+        b"Content-Length: " + str(len(data)).encode() + b"\r\n\r\n" +
+        data + b"\r\n"
+    )
+
+
+def new_chunk(frame: EncodedFrame) -> bytes:
+    return frame.part
+
+
+async def viewer(hub: FrameHub, mode: str, n_frames: int, sink: list, idx: int):
+    sub = hub.subscribe("bench", maxsize=n_frames + 1)
+    try:
+        for _ in range(n_frames):
+            frame = await sub.get()
+            chunk = old_chunk(frame.jpeg) if mode == "old" else new_chunk(frame)
+            sink[idx] = chunk       # el transporte retiene el chunk hasta escribirlo
+            await asyncio.sleep(0)
+    finally:
+        sub.close()
+
+
+async def run_case(mode: str, n_viewers: int, n_frames: int, jpeg: bytes) -> tuple[float, float]:
+    hub = FrameHub()
+    sink: list = [None] * n_viewers
+    tasks = [asyncio.create_task(viewer(hub, mode, n_frames, sink, i)) for i in range(n_viewers)]
+    await asyncio.sleep(0)
+
+    tracemalloc.start()
+    cpu0 = time.process_time()
+    for seq in range(1, n_frames + 1):
+        hub.publish(EncodedFrame.build(seq=seq, t_recv=time.monotonic(), ts=time.time(), jpeg=jpeg))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    cpu = time.process_time() - cpu0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--frames", type=int, default=200)
+    ap.add_argument("--jpeg-kb", type=int, default=120)
+    args = ap.parse_args()
+
+    jpeg = os.urandom(args.jpeg_kb * 1024)
+    print(f"frames={args.frames} jpeg={args.jpeg_kb} KB")
+    print(f"{'viewers':>8} {'mode':>5} {'cpu ms':>9} {'µs/viewer/frame':>16} {'peak MB':>8} {'KB/viewer':>10}")
+    for n in (10, 50, 100):
+        for mode in ("old", "new"):
+            cpu, peak = await run_case(mode, n, args.frames, jpeg)
+            per = cpu / (n * args.frames) * 1e6
+            print(f"{n:>8} {mode:>5} {cpu * 1e3:>9.1f} {per:>16.2f} {peak / 2**20:>8.1f} {peak / 1024 / n:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark del camino de publicación de Move: coste por publish, antiguo vs fast path.
+
+Usa el WebRTCDataChannelPubSub real del driver sobre un datachannel de pega
+(readyState "open", send() que sólo cuenta bytes) y resuelve la respuesta del
+robot en el acto, así se mide sólo lo que hace el proceso: construir el payload,
+el JSON del driver y el envío.
+
+  - old: dict nuevo por Move + SPORT_CMD["Move"] + RTC_TOPIC["SPORT_MOD"] en cada
+         llamada; el driver hace json.dumps del parameter.
+  - new: MovePayload (api_id cacheado, parameter ya en str en un dict propio por Move)
+         y topic resuelto una vez.
+
+Uso:
+    python bench/bench_move_publish.py [--n 50000]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from go2_webrtc_driver.constants import RTC_TOPIC, SPORT_CMD  # noqa: E402
+from go2_webrtc_driver.msgs.pub_sub import WebRTCDataChannelPubSub  # noqa: E402
+
+from backend.commands import MovePayload  # noqa: E402
+
+
+class FakeChannel:
+    readyState = "open"
+
+    def __init__(self):
+        self.bytes = 0
+        self.messages = 0
+
+    def send(self, message: str):
+        self.bytes += len(message)
+        self.messages += 1
+
+
+def make_pub_sub() -> tuple[WebRTCDataChannelPubSub, FakeChannel]:
+    channel = FakeChannel()
+    pub_sub = WebRTCDataChannelPubSub(channel)
+
+    # Respuesta inmediata del "robot": el future se resuelve al guardarse
+    def save_resolve(_type, _topic, future, _uuid):
+        future.set_result(None)
+
+    pub_sub.future_resolver.save_resolve = save_resolve
+    return pub_sub, channel
+
+
+async def old_path(pub_sub, x, y, z):
+    payload = {
+        "api_id": SPORT_CMD["Move"],
+        "parameter": {"x": float(x), "y": float(y), "z": float(z)},
+    }
+    await pub_sub.publish_request_new(RTC_TOPIC["SPORT_MOD"], payload)
+
+
+def new_path_factory(pub_sub):
+    topic = RTC_TOPIC["SPORT_MOD"]
+    move = MovePayload(SPORT_CMD["Move"])
+
+    async def new_path(_pub_sub, x, y, z):
+        await pub_sub.publish_request_new(topic, move.fill(x, y, z))
+
+    return new_path
+
+
+async def run(fn, pub_sub, n: int) -> float:
+    # calentamiento
+    for i in range(1000):
+        await fn(pub_sub, i * 1e-3, 0.0, -0.5)
+    t0 = time.perf_counter()
+    for i in range(n):
+        await fn(pub_sub, i * 1e-3, 0.25, -0.5)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=50000)
+    args = ap.parse_args()
+
+    # El driver hace logging.info de cada mensaje; se silencia para medir el camino, no el log
+    logging.disable(logging.INFO)
+
+    results = {}
+    for name in ("old", "new"):
+        pub_sub, channel = make_pub_sub()
+        fn = old_path if name == "old" else new_path_factory(pub_sub)
+        us = await run(fn, pub_sub, args.n)
+        results[name] = us
+        print(f"{name:>4}: {us:7.2f} µs/publish   msg={channel.bytes // channel.messages} B")
+    print(f"speedup: {results['old'] / results['new']:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,8 +3,15 @@ const statusEl = $("status");
 const gamepadEl = $("gamepad-status");
 const logsEl = $("logs");
 
+// Robot de esta página (?robot=go2-2); sin parámetro, la sesión "default"
+const ROBOT = new URLSearchParams(location.search).get("robot");
+function withRobot(url) {
+  if (!ROBOT) return url;
+  return url + (url.includes("?") ? "&" : "?") + "robot=" + encodeURIComponent(ROBOT);
+}
+
 async function getStatus() {
-  const res = await fetch("/api/status");
+  const res = await fetch(withRobot("/api/status"));
   const data = await res.json();
   const running = data.running ? "🟢 Ejecutando" : "🔴 Detenido";
   const cfg = data.config ? JSON.stringify(data.config) : "—";
@@ -18,21 +25,63 @@ function updateGamepad(connected) {
     : `Mando: <span class="warn">⚠️ No detectado</span>`;
 }
 
+// Un nodo de texto por línea: recortar es quitar los primeros nodos, sin re-partir todo el texto
+const MAX_LOG_LINES = 500;
+// seq del último registro mostrado (evita duplicar el histórico al reconectar); el seq
+// vuelve a empezar si el servidor se reinicia, y eso se detecta por el cambio de época
+let lastLogSeq = 0;
+let logEpoch = null;
+
 function appendLog(line) {
-  logsEl.textContent += line + "\n";
+  appendLines([line]);
+}
+
+function appendLines(lines) {
+  if (!lines.length) return;
+  const frag = document.createDocumentFragment();
+  for (const line of lines) frag.appendChild(document.createTextNode(line + "\n"));
+  logsEl.appendChild(frag);
+  let extra = logsEl.childNodes.length - MAX_LOG_LINES;
+  while (extra-- > 0) logsEl.removeChild(logsEl.firstChild);
   logsEl.scrollTop = logsEl.scrollHeight;
-  if (logsEl.textContent.split("\n").length > 500)
-    logsEl.textContent = logsEl.textContent.split("\n").slice(-500).join("\n");
+}
+
+function formatLogTime(t) {
+  const d = new Date(t * 1000);
+  const p = (n) => String(n).padStart(2, "0");
+  return `${d.getFullYear()}-${p(d.getMonth() + 1)}-${p(d.getDate())} ${p(d.getHours())}:${p(d.getMinutes())}:${p(d.getSeconds())}`;
+}
+
+// Registros estructurados {seq, t, level, topic, msg} (en lotes y como histórico al conectar)
+function appendRecords(records, epoch) {
+  if (epoch !== logEpoch) {
+    logEpoch = epoch;
+    lastLogSeq = 0;
+  }
+  const lines = [];
+  for (const r of records) {
+    if (r.seq <= lastLogSeq) continue;
+    lastLogSeq = r.seq;
+    lines.push(`${formatLogTime(r.t)} | ${r.level} | ${r.msg}`);
+  }
+  appendLines(lines);
 }
 
 function connectLogs() {
   const proto = location.protocol === "https:" ? "wss" : "ws";
-  const ws = new WebSocket(`${proto}://${location.host}/ws/logs`);
+  // Filtro en servidor desde la URL de la página: ?loglevel=INFO&logtopic=teleop,go2_client
+  const page = new URLSearchParams(location.search);
+  const params = new URLSearchParams();
+  if (page.get("loglevel")) params.set("level", page.get("loglevel"));
+  if (page.get("logtopic")) params.set("topic", page.get("logtopic"));
+  const qs = params.toString();
+  const ws = new WebSocket(`${proto}://${location.host}/ws/logs${qs ? "?" + qs : ""}`);
 
   ws.onmessage = (e) => {
     try {
       const msg = JSON.parse(e.data);
-      if (msg.type === "log") appendLog(msg.data);
+      if (msg.type === "logs") appendRecords(msg.data, msg.epoch);
+      else if (msg.type === "log") appendLog(msg.data);
       else if (msg.type === "gamepad") updateGamepad(msg.data === "connected");
       else appendLog(e.data);
     } catch {
@@ -49,7 +98,7 @@ function connectLogs() {
 $("btn-connect").addEventListener("click", async () => {
   const method = $("method").value;
   const ip = $("ip").value || null;
-  await fetch("/api/connect", {
+  await fetch(withRobot("/api/connect"), {
     method: "POST",
     headers: {"Content-Type":"application/json"},
     body: JSON.stringify({ method, ip })
@@ -58,7 +107,7 @@ $("btn-connect").addEventListener("click", async () => {
 });
 
 $("btn-disconnect").addEventListener("click", async () => {
-  await fetch("/api/disconnect", { method: "POST" });
+  await fetch(withRobot("/api/disconnect"), { method: "POST" });
   await getStatus();
 });
 
@@ -70,36 +119,122 @@ connectLogs();
   const status = document.getElementById('cam-status');
   if (!img) return;
 
-  const mjpegUrl = '/api/video/mjpeg';
+  const mjpegUrl = withRobot('/api/video/mjpeg');
 
   function setStatus(t) {
     if (status) status.textContent = t || '';
   }
 
-  // Prueba MJPEG; si falla, cambia a refresco periódico del frame
-  const test = new Image();
-  let decided = false;
+  // 1) Preferido: /ws/video (binario: versión u8 | seq u64 | ts f64 | JPEG)
+  // 2) Si no abre: MJPEG
+  // 3) Si MJPEG falla o es lento: refresco periódico del frame
+  const WS_HEADER_LEN = 17;
+  const WS_OPEN_TIMEOUT_MS = 3000;   // si el socket no abre en este tiempo -> MJPEG
+  const WS_STALL_MS = 3000;          // sin frames este tiempo -> aviso (el transporte no cambia)
+  let objectUrl = null;
 
-  test.onload = () => {
-    if (decided) return;
-    decided = true;
-    img.src = mjpegUrl;
-    setStatus('MJPEG conectado');
-  };
-  test.onerror = () => {
-    if (decided) return;
-    decided = true;
-    setStatus('MJPEG no disponible, usando refresco periódico…');
-    startPolling();
-  };
-  test.src = mjpegUrl + '?probe=1';
+  function startWebSocket() {
+    const proto = location.protocol === "https:" ? "wss" : "ws";
+    let ws;
+    try {
+      ws = new WebSocket(withRobot(`${proto}://${location.host}/ws/video`));
+    } catch {
+      startMjpeg();
+      return;
+    }
+    ws.binaryType = 'arraybuffer';
+
+    // El transporte se decide al abrir (o fallar) el socket, no al llegar el primer frame:
+    // si el robot aún no está conectado el WS sigue siendo válido y esperará sus frames.
+    let opened = false;
+    let stallTimer = null;
+    let stalled = false;
+    const armStall = () => {
+      clearTimeout(stallTimer);
+      if (stalled) {
+        stalled = false;
+        setStatus('Vídeo por WebSocket');
+      }
+      stallTimer = setTimeout(() => {
+        stalled = true;
+        setStatus('WebSocket abierto, esperando vídeo…');
+      }, WS_STALL_MS);
+    };
+
+    const openTimer = setTimeout(() => {
+      if (!opened) ws.close();
+    }, WS_OPEN_TIMEOUT_MS);
+
+    ws.onopen = () => {
+      opened = true;
+      clearTimeout(openTimer);
+      setStatus('Vídeo por WebSocket');
+      armStall();
+    };
+
+    ws.onmessage = (e) => {
+      armStall();
+      const view = new DataView(e.data);
+      const seq = Number(view.getBigUint64(1));
+      const ts = view.getFloat64(9);
+      const blob = new Blob([new Uint8Array(e.data, WS_HEADER_LEN)], { type: 'image/jpeg' });
+      const url = URL.createObjectURL(blob);
+      // El blob anterior ya no hace falta (mostrado o sustituido a mitad de carga)
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+      objectUrl = url;
+      img.src = url;
+      img.dataset.seq = seq;
+      img.dataset.latencyMs = Math.max(0, Date.now() - ts * 1000).toFixed(0);
+    };
+    ws.onerror = () => ws.close();
+    ws.onclose = () => {
+      clearTimeout(openTimer);
+      clearTimeout(stallTimer);
+      if (!opened) {
+        startMjpeg();
+        return;
+      }
+      // Estaba abierto: reintenta por WebSocket
+      setStatus('WebSocket de vídeo cerrado, reintentando…');
+      setTimeout(startWebSocket, 2000);
+    };
+  }
+
+  function startMjpeg() {
+    // Prueba MJPEG; si falla, cambia a refresco periódico del frame
+    const test = new Image();
+    let decided = false;
+
+    test.onload = () => {
+      if (decided) return;
+      decided = true;
+      img.src = mjpegUrl;
+      setStatus('MJPEG conectado');
+    };
+    test.onerror = () => {
+      if (decided) return;
+      decided = true;
+      setStatus('MJPEG no disponible, usando refresco periódico…');
+      startPolling();
+    };
+    test.src = withRobot('/api/video/mjpeg?probe=1');
+
+    // Si en 1500ms no decidió, haz fallback
+    setTimeout(() => {
+      if (!decided) {
+        decided = true;
+        setStatus('MJPEG lento, usando refresco periódico…');
+        startPolling();
+      }
+    }, 1500);
+  }
 
   // Fallback a frame único cada 250ms
   let pollTimer = null;
   function startPolling() {
     stopPolling();
     pollTimer = setInterval(() => {
-      img.src = '/api/video/frame?ts=' + Date.now();
+      img.src = withRobot('/api/video/frame?ts=' + Date.now());
     }, 250);
   }
   function stopPolling() {
@@ -109,14 +244,7 @@ connectLogs();
     }
   }
 
-  // Si en 1500ms no decidió, haz fallback
-  setTimeout(() => {
-    if (!decided) {
-      decided = true;
-      setStatus('MJPEG lento, usando refresco periódico…');
-      startPolling();
-    }
-  }, 1500);
+  startWebSocket();
 })();
 
 // === Manual SPORT_CMD execution ===
@@ -192,7 +320,7 @@ document.getElementById("sendCmdBtn").addEventListener("click", async () => {
   }
 
   try {
-    const response = await fetch("/api/cmd", {
+    const response = await fetch(withRobot("/api/cmd"), {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ cmd: cmdName })
@@ -216,7 +344,7 @@ document.getElementById("setModeBtn").addEventListener("click", async () => {
   }
 
   try {
-    const response = await fetch("/api/mode", {
+    const response = await fetch(withRobot("/api/mode"), {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ mode }),
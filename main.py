@@ -11,6 +11,8 @@ from loguru import logger
 from go2_webrtc_driver.webrtc_driver import Go2WebRTCConnection, WebRTCConnectionMethod
 from go2_webrtc_driver.constants import RTC_TOPIC, SPORT_CMD
 
+from backend.commands import MoveFilter
+
 
 def clamp(v: float, lo: float, hi: float) -> float:
     return lo if v < lo else hi if v > hi else v
@@ -59,6 +61,9 @@ class XboxTeleop:
         username: Optional[str] = None,  # para Remote
         password: Optional[str] = None,  # para Remote
         serial: Optional[str] = None,    # ip o serial (para scan LocalSTA)
+        suppress: bool = False,          # sólo envía Move si cambia (+ heartbeat)
+        move_eps: float = 0.01,
+        heartbeat: float = 0.25,         # s
     ) -> None:
         self.period = 1.0 / rate_hz
         self.dz = dz
@@ -74,6 +79,7 @@ class XboxTeleop:
 
         self.conn: Optional[Go2WebRTCConnection] = None
         self.running = True
+        self.move_filter: Optional[MoveFilter] = MoveFilter(move_eps, heartbeat) if suppress else None
 
     async def connect(self) -> None:
         # Construye la conexión EXACTAMENTE como en el driver original
@@ -128,6 +134,8 @@ class XboxTeleop:
 
     async def estop_soft(self) -> None:
         await self.cmd("StopMove")
+        if self.move_filter:
+            self.move_filter.reset()
         # además envía una última velocidad 0 por seguridad
         await self.send_move(0.0, 0.0, 0.0)
 
@@ -179,7 +187,8 @@ class XboxTeleop:
                 now = time.time()
                 if now - last >= self.period:
                     x, y, z = self.read_axes(js)
-                    await self.send_move(x, y, z)
+                    if self.move_filter is None or self.move_filter.should_send(x, y, z):
+                        await self.send_move(x, y, z)
                     last = now
 
                 await asyncio.sleep(0.0)
@@ -193,6 +202,8 @@ class XboxTeleop:
                 pass
             if self.conn:
                 await self.conn.disconnect()
+            if self.move_filter:
+                logger.info(f"Move enviados={self.move_filter.sent} suprimidos={self.move_filter.suppressed}")
             pygame.quit()
             logger.info("Cerrado correctamente.")
 
@@ -209,6 +220,9 @@ def main():
     parser.add_argument("--max-z", type=float, default=1.5, help="Vel. angular Z máx (rad/s)")
     parser.add_argument("--username", help="(Remote) Usuario Unitree")
     parser.add_argument("--password", help="(Remote) Password Unitree")
+    parser.add_argument("--suppress", action="store_true", help="Sólo envía Move si cambia más de --move-eps")
+    parser.add_argument("--move-eps", type=float, default=0.01, help="Umbral de cambio para --suppress")
+    parser.add_argument("--heartbeat", type=float, default=0.25, help="Keepalive de Move con --suppress (s)")
     args = parser.parse_args()
 
     method = parse_connection_method(args.method)
@@ -231,6 +245,9 @@ def main():
         username=args.username,
         password=args.password,
         serial=args.serial,
+        suppress=args.suppress,
+        move_eps=args.move_eps,
+        heartbeat=args.heartbeat,
     )
     asyncio.run(teleop.run())
 